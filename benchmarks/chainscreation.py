@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+"""
+Chains enumeration on a synthetic universe of pairs.
+
+Run from the repository root: python -m benchmarks.chainscreation
+"""
+import time
+import random
+
+from src.core.chainscreator import ChainsCreator
+
+
+PAIRS_NUM = 5000
+ASSETS_NUM = 1500
+MAIN_ASSETS = ['BTS', 'BRIDGE.BTC', 'CNY', 'USD']
+# Share of pairs which contain one of main assets, as on the real exchange most markets are against them.
+MAIN_PAIRS_SHARE = 0.4
+
+
+def make_pairs(pairs_num=PAIRS_NUM, assets_num=ASSETS_NUM, seed=1):
+    rnd = random.Random(seed)
+    assets = [f'ASSET{i}' for i in range(assets_num)]
+    pairs = set()
+
+    while len(pairs) < pairs_num:
+        base = rnd.choice(MAIN_ASSETS) if rnd.random() < MAIN_PAIRS_SHARE else rnd.choice(assets)
+        quote = rnd.choice(assets)
+
+        if base != quote:
+            pairs.add(f'{base}:{quote}' if rnd.random() < 0.5 else f'{quote}:{base}')
+
+    return list(pairs)
+
+
+def create_chains_before(pairs):
+    """
+    Nested loops over the whole pair list as they were, without awaits and ids lookups.
+    """
+    def adjust_asset_location_in_seq(asset, seq):
+        if seq[0] != asset:
+            seq.reverse()
+
+        return seq
+
+    pairs = [pair.split(':') for pair in pairs]
+    chains = []
+
+    for main_asset in MAIN_ASSETS:
+        asset_chains = []
+
+        for pair in pairs:
+            if main_asset in pair:
+                main = adjust_asset_location_in_seq(main_asset, pair).copy()
+
+                for pair2 in pairs:
+                    if main[1] in pair2 and main_asset not in pair2:
+                        secondary = adjust_asset_location_in_seq(main[1], pair2).copy()
+
+                        for pair3 in pairs:
+                            if secondary[1] in pair3 and main_asset in pair3:
+                                tertiary = adjust_asset_location_in_seq(secondary[1], pair3).copy()
+                                chain = '{}:{} {}:{} {}:{}'.format(*main, *secondary, *tertiary)
+
+                                if chain not in asset_chains:
+                                    asset_chains.append(chain)
+
+        chains.extend(asset_chains)
+
+    return chains
+
+
+def create_chains_after(pairs):
+    adjacency = ChainsCreator.get_adjacency_index(pairs)
+
+    return [
+        f'{main}:{asset} {asset}:{asset2} {asset2}:{main}'
+        for main_asset in MAIN_ASSETS for main, asset, asset2 in ChainsCreator.get_triangles(main_asset, adjacency)
+    ]
+
+
+def main():
+    pairs = make_pairs()
+    results = {}
+
+    for name, func in (('after', create_chains_after), ('before', create_chains_before)):
+        time_start = time.perf_counter()
+        results[name] = func(pairs)
+        print(f'{name:>6}: {time.perf_counter() - time_start:.3f} s, {len(results[name])} chains')
+
+    assert sorted(results['before']) == sorted(results['after'])
+
+
+if __name__ == '__main__':
+    main()
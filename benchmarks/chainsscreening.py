@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""
+Screening of chains by the market graph on a synthetic universe of pairs.
+
+Chains are created as ChainsCreator creates them, best prices of pairs are fair prices of assets with
+random spread, so a small share of chains is profitable. Screening must keep every profitable chain
+and give screened out chains the same profits as computing them one by one, also after a few edges
+change and the graph is searched again incrementally.
+
+Run from the repository root: python -m benchmarks.chainsscreening
+"""
+import math
+import time
+import random
+
+from src.core.chainscreator import ChainsCreator
+from src.algorithms.marketgraph import MarketGraph
+
+from .chainscreation import make_pairs, MAIN_ASSETS
+
+
+SPREAD = 0.003
+SPREAD_DEVIATION = 0.004
+MAX_FEE = 0.2
+CHANGED_EDGES_NUM = 20
+
+
+def get_chain_profit(chain, prices, fees):
+    amount = 1.
+
+    for pair in chain:
+        amount *= (1 - fees[pair] / 100) / prices[pair]
+
+    return amount - 1
+
+
+def check_screening(chains, prices, fees, kept_chains, screened_chains):
+    assert len(kept_chains) + len(screened_chains) == len(chains)
+    kept_chains = set(kept_chains)
+
+    for chain in chains:
+        profit = get_chain_profit(chain, prices, fees)
+
+        if profit > 0:
+            assert chain in kept_chains, chain
+
+        if chain in screened_chains:
+            assert math.isclose(screened_chains[chain], profit, abs_tol=1e-12), chain
+
+
+def main():
+    rnd = random.Random(1)
+    adjacency = ChainsCreator.get_adjacency_index(make_pairs())
+    values = {asset: math.exp(rnd.uniform(-5, 5)) for asset in adjacency}
+    assets_fees = {asset: rnd.uniform(0, MAX_FEE) for asset in adjacency}
+
+    chains = [
+        (f'{main}:{asset}', f'{asset}:{asset2}', f'{asset2}:{main}')
+        for main_asset in MAIN_ASSETS for main, asset, asset2 in ChainsCreator.get_triangles(main_asset, adjacency)
+    ]
+    pairs = {pair for chain in chains for pair in chain}
+
+    def get_price(pair):
+        base, quote = pair.split(':')
+        return values[quote] / values[base] * math.exp(rnd.gauss(SPREAD, SPREAD_DEVIATION))
+
+    prices = {pair: get_price(pair) for pair in pairs}
+    fees = {pair: assets_fees[pair.split(':')[1]] for pair in pairs}
+    graph = MarketGraph(MAIN_ASSETS)
+
+    time_start = time.perf_counter()
+
+    for pair in pairs:
+        graph.set_edge(pair, prices[pair], fees[pair])
+
+    kept_chains, screened_chains = graph.screen_chains(chains)
+    secs = time.perf_counter() - time_start
+    check_screening(chains, prices, fees, kept_chains, screened_chains)
+    profitable_num = sum(get_chain_profit(chain, prices, fees) > 0 for chain in chains)
+    print(f'{len(chains)} chains of {len(pairs)} pairs, {profitable_num} profitable: '
+          f'{len(kept_chains)} kept, {len(screened_chains)} screened out in {secs * 1e3:.1f} ms')
+
+    for pair in rnd.sample(sorted(pairs), CHANGED_EDGES_NUM):
+        prices[pair] = get_price(pair)
+
+    time_start = time.perf_counter()
+
+    for pair in pairs:
+        graph.set_edge(pair, prices[pair], fees[pair])
+
+    kept_chains, screened_chains = graph.screen_chains(chains)
+    secs = time.perf_counter() - time_start
+    check_screening(chains, prices, fees, kept_chains, screened_chains)
+    print(f'After {CHANGED_EDGES_NUM} changed edges: '
+          f'{len(kept_chains)} kept, {len(screened_chains)} screened out in {secs * 1e3:.1f} ms')
+
+    time_start = time.perf_counter()
+    profits = [get_chain_profit(chain, prices, fees) for chain in chains]
+    secs = time.perf_counter() - time_start
+    print(f'Profits of all chains one by one in {secs * 1e3:.1f} ms, {sum(profit > 0 for profit in profits)} profitable')
+
+
+if __name__ == '__main__':
+    main()
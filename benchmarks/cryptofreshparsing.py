@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""
+Extraction of assets and markets from cryptofresh pages.
+
+Fixtures in benchmarks/fixtures follow markup of cryptofresh.com assets and asset markets tables,
+pages saved from the site may be put in place of them.
+
+Run from the repository root: python -m benchmarks.cryptofreshparsing
+"""
+import os
+import re
+import timeit
+
+from bs4 import BeautifulSoup
+
+from src.parsers.cryptofreshparser import CryptofreshParser
+
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), 'fixtures')
+PAGES = (
+    # File, min volume, find asset.
+    ('cryptofresh_assets.html', 1000, True),
+    ('cryptofresh_asset.html', 10, False),
+)
+NUMBER = 20
+
+
+def extract_before(html, min_volume, find_asset=False):
+    """
+    BeautifulSoup tree and regexes over serialized rows as they were, without awaits.
+    """
+    bs_obj = BeautifulSoup(html, 'lxml')
+    table = bs_obj.find('tbody')
+    valid_data = []
+
+    for elem in table.find_all('tr'):
+        pattern = re.compile(r'/a/\w+\.?\w+') if find_asset else re.compile(r'\w+\.?\w+ : \w+\.?\w+')
+        data = re.findall(pattern, str(elem))[0].replace(' ', '').strip()
+
+        try:
+            res = re.findall(re.compile(r'(\$\d+([,.]?\d+)*)'), str(elem))[2]
+        except IndexError:
+            break
+
+        if float(re.sub(r'\$?,?', '', res[0]).strip()) > min_volume:
+            valid_data.append(data)
+        else:
+            break
+
+    return valid_data
+
+
+def main():
+    for file, min_volume, find_asset in PAGES:
+        with open(os.path.join(FIXTURES_DIR, file), 'r') as f:
+            html = f.read()
+
+        before = extract_before(html, min_volume, find_asset)
+        after = CryptofreshParser.extract_valid_data(html, min_volume, find_asset)
+
+        assert before == after
+        print(f'{file}: {len(after)} rows above min volume')
+
+        for name, stmt in (
+                ('before', lambda: extract_before(html, min_volume, find_asset)),
+                ('after', lambda: CryptofreshParser.extract_valid_data(html, min_volume, find_asset)),
+        ):
+            secs = min(timeit.repeat(stmt, number=NUMBER, repeat=5)) / NUMBER
+            print(f'{name:>6}: {secs * 1e3:.2f} ms per page')
+
+
+if __name__ == '__main__':
+    main()
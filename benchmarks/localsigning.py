@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+"""
+Serialization and signing of transactions by the local signer.
+
+Fixtures in benchmarks/fixtures/transactions.json are signed BitShares transactions with the test key
+of python-bitshares: limit_order_create from its test suite and a three legs fill-or-kill transaction
+made by its serializer. Serialized transactions must match them byte by byte, and signatures, both
+of the fixtures and own ones, must be canonical and recover to the public key of the test key.
+
+Requires ecdsa. Run from the repository root: python -m benchmarks.localsigning
+"""
+import os
+import timeit
+
+import ujson
+
+from binascii import unhexlify
+
+from src.aiopybitshares import signer
+
+
+FIXTURES_FILE = os.path.join(os.path.dirname(__file__), 'fixtures', 'transactions.json')
+NUMBER = 200
+
+
+def check_signature(signature, digest, public_key):
+    assert signer.is_canonical(signature[1:])
+    assert signer.recover_public_key(signature, digest) == public_key
+
+
+def main():
+    with open(FIXTURES_FILE, 'r') as f:
+        fixtures = ujson.load(f)
+
+    chain_id = fixtures['chain_id']
+    signing_key = signer.get_signing_key(fixtures['wif'])
+    public_key = signing_key.get_verifying_key().to_string('compressed')
+
+    for fixture in fixtures['transactions']:
+        tx = fixture['transaction']
+        # Transaction is followed by number of signatures and 65 bytes of signature.
+        serialized, signature = unhexlify(fixture['hex'][:-132]), unhexlify(fixture['hex'][-130:])
+        digest = signer.get_digest(chain_id, tx)
+
+        assert signer.serialize_transaction(tx) == serialized
+        check_signature(signature, digest, public_key)
+        check_signature(signer.sign_digest(signing_key, digest), digest, public_key)
+        print(f'{fixture["name"]}: {len(serialized)} bytes match, signatures are valid')
+
+        for name, stmt in (
+                ('serialize', lambda: signer.serialize_transaction(tx)),
+                ('sign', lambda: signer.sign_digest(signing_key, signer.get_digest(chain_id, tx))),
+        ):
+            secs = min(timeit.repeat(stmt, number=NUMBER, repeat=3)) / NUMBER
+            print(f'{name:>10}: {secs * 1e6:.1f} us per transaction')
+
+
+if __name__ == '__main__':
+    main()
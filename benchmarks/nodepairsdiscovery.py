@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+"""
+Discovery of pairs on a local stand-in node.
+
+The stand-in is a websocket JSON-RPC server which answers get_top_markets, get_ticker and
+get_24_volume from PRICES and VOLUMES below, get_24_volume of FAILING_MARKET returns an error.
+NodePairsParser must find EXPECTED_PAIRS and skip the failed market, and ask volumes only of markets
+of assets against core assets: EXPECTED_VOLUME_REQUESTS instead of one per each pair of assets.
+
+Run from the repository root: python -m benchmarks.nodepairsdiscovery
+"""
+import os
+import time
+import logging
+import asyncio
+import tempfile
+
+import ujson
+
+from aiohttp import web
+from collections import Counter
+
+from src.parsers.nodepairsparser import NodePairsParser
+from src.aiopybitshares.connectionpool import pool
+
+
+HOST = '127.0.0.1'
+PORT = 18770
+# Assets traded only against BTS.
+TOKENS = [f'T{i:02}' for i in range(1, 21)]
+# Prices of assets in BTS.
+PRICES = {
+    'BTS': 1, 'CNY': 2.5, 'USD': 20, 'BRIDGE.BTC': 500_000, 'A1': .1, 'A2': 3, 'A3': .5, 'A4': 7, 'DEAD': 0,
+    **{token: 1 for token in TOKENS},
+}
+# 24h volumes of markets in BTS.
+VOLUMES = {
+    ('BTS', 'CNY'): 1e6, ('BTS', 'USD'): 5e5, ('CNY', 'USD'): 2e5, ('BTS', 'BRIDGE.BTC'): 1e5,
+    ('BTS', 'A1'): 1e4, ('BTS', 'A3'): 5e3, ('CNY', 'A4'): 4e3, ('A3', 'A4'): 1e3, ('USD', 'A1'): 50,
+    ('CNY', 'A2'): 30, ('A1', 'A2'): 1, ('BTS', 'DEAD'): .1,
+    **{('BTS', token): 3e3 for token in TOKENS},
+}
+TOP_MARKETS_NUM = 29
+FAILING_MARKET = ('BRIDGE.BTC', 'CNY')
+OVERALL_MIN_DAILY_VOLUME = 100
+PAIR_MIN_DAILY_VOLUME = 5
+EXPECTED_PAIRS = {
+    'BTS:CNY', 'BTS:USD', 'CNY:USD', 'BTS:BRIDGE.BTC', 'BTS:A1', 'BTS:A3', 'CNY:A4', 'A3:A4',
+    *(f'BTS:{token}' for token in TOKENS),
+}
+# 98 markets of valid assets against 4 core assets without 28 top markets among them.
+EXPECTED_VOLUME_REQUESTS = 70
+requests = Counter()
+
+
+def get_volume(base, quote):
+    volume = VOLUMES.get((base, quote), VOLUMES.get((quote, base), 0))
+
+    return {
+        'base': base, 'quote': quote,
+        'base_volume': str(volume / PRICES[base] if PRICES[base] else 0),
+        'quote_volume': str(volume / PRICES[quote] if PRICES[quote] else 0),
+    }
+
+
+def get_response(method, params):
+    """
+    :return: tuple of result and error.
+    """
+    requests[method] += 1
+
+    if method == 'get_top_markets':
+        markets = sorted(VOLUMES, key=VOLUMES.get, reverse=True)[:min(params[0], TOP_MARKETS_NUM)]
+        return [get_volume(*market) for market in markets], None
+
+    if method == 'get_ticker':
+        base, quote = params
+        latest = PRICES[quote] / PRICES[base] if PRICES[base] and PRICES[quote] else 0
+        return {'base': base, 'quote': quote, 'latest': str(latest)}, None
+
+    if method == 'get_24_volume':
+        if tuple(params) in (FAILING_MARKET, FAILING_MARKET[::-1]):
+            return None, {'message': 'Market is not available.'}
+
+        return get_volume(*params), None
+
+    return None, {'message': f'Unknown method {method}.'}
+
+
+async def handle(request):
+    ws = web.WebSocketResponse()
+    await ws.prepare(request)
+
+    async for msg in ws:
+        data = ujson.loads(msg.data)
+        result, error = get_response(data['method'], data['params'])
+        response = {'id': data['id'], 'jsonrpc': '2.0'}
+        response.update({'error': error} if error else {'result': result})
+        await ws.send_str(ujson.dumps(response))
+
+    return ws
+
+
+async def discover(output_dir):
+    app = web.Application()
+    app.router.add_get('/ws', handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, HOST, PORT).start()
+
+    parser = NodePairsParser(asyncio.get_event_loop())
+    parser.overall_min_daily_volume = OVERALL_MIN_DAILY_VOLUME
+    parser.pair_min_daily_volume = PAIR_MIN_DAILY_VOLUME
+    parser._old_file, parser._new_file = None, os.path.join(output_dir, 'pairs.lst')
+    await parser._market.connect(ws_node=f'ws://{HOST}:{PORT}/ws')
+
+    try:
+        time_start = time.monotonic()
+        file_data = await parser.parse()
+        secs = time.monotonic() - time_start
+    finally:
+        await pool.close()
+        await runner.cleanup()
+
+    with open(file_data.file, 'r') as f:
+        pairs = set(f.read().split())
+
+    return pairs, secs
+
+
+def main():
+    logging.basicConfig(level=logging.WARNING, format='%(name)s - %(message)s')
+
+    with tempfile.TemporaryDirectory() as output_dir:
+        pairs, secs = asyncio.get_event_loop().run_until_complete(discover(output_dir))
+
+    assert pairs == EXPECTED_PAIRS, pairs
+    assert requests['get_24_volume'] == EXPECTED_VOLUME_REQUESTS, requests
+    print(f'Discovered {len(pairs)} pairs in {secs * 1e3:.1f} ms')
+    print(f'Requests: {", ".join(f"{method} {num}" for method, num in requests.items())}')
+
+    assets = {asset for pair in pairs for asset in pair.split(':')}
+    print(f'Volumes of all pairs of {len(assets)} assets would take '
+          f'{len(assets) * (len(assets) - 1) // 2 - TOP_MARKETS_NUM} get_24_volume requests')
+
+
+if __name__ == '__main__':
+    main()
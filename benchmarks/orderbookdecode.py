@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+"""
+Per-frame cost of decoding get_order_book responses.
+
+Run from the repository root: python -m benchmarks.orderbookdecode
+"""
+import timeit
+
+import ujson
+import numpy as np
+
+from src.aiopybitshares.grambitshares import response_id_pattern
+from src.aiopybitshares.market import OrderBookDecoder, fast_json
+
+
+DEPTH = 5
+NUMBER = 20000
+
+
+def make_frame(depth):
+    orders = [
+        {'price': f'{0.1 + i * 0.001:.8f}', 'quote': f'{100 + i:.5f}', 'base': f'{10 + i:.5f}'}
+        for i in range(depth)
+    ]
+
+    return ujson.dumps(
+        {'id': 1, 'jsonrpc': '2.0', 'result': {'base': 'BTS', 'quote': 'CNY', 'bids': orders, 'asks': orders}}
+    )
+
+
+def decode_before(frame):
+    raw_orders_data = ujson.loads(frame)['result']['asks']
+
+    return np.array([
+        *map(
+            lambda order_data: tuple(float(value) for value in order_data.values()), raw_orders_data
+        )
+    ], dtype=np.float64)
+
+
+def decode_after(frame, decoder):
+    response_id_pattern.match(frame)
+
+    return decoder.buffer[:decoder(frame)]
+
+
+def main():
+    frame = make_frame(DEPTH)
+    decoder = OrderBookDecoder(DEPTH)
+
+    assert np.array_equal(decode_before(frame), decode_after(frame, decoder))
+
+    for name, stmt in (('before', lambda: decode_before(frame)), ('after', lambda: decode_after(frame, decoder))):
+        secs = min(timeit.repeat(stmt, number=NUMBER, repeat=5)) / NUMBER
+        print(f'{name:>6}: {secs * 1e6:.2f} us per frame')
+
+    print(f'json backend: {fast_json.__name__}')
+
+
+if __name__ == '__main__':
+    main()
@@ -51,6 +51,9 @@ setup(
         'ujson==1.35',
         'markdown',
     ],
+    extras_require={
+        'signer': ['ecdsa'],
+    },
     include_package_data=True,
     packages=find_packages(),
     package_data={
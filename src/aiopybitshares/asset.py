@@ -1,22 +1,13 @@
 # -*- coding: utf-8 -*-
-from .grambitshares import GramBitshares, default_node
+from .pooledgram import PooledGram
 
 
-class Asset(GramBitshares):
-    def __init__(self):
-        super().__init__()
-        self._gram = None
-
-    async def connect(self, ws_node=default_node):
-        self._gram = await super().connect(ws_node)
-
-        return self
-
+class Asset(PooledGram):
     async def convert_name_to_id(self, asset_name, limit=1):
         """
         Wallet method.
         """
-        raw_data = await self._gram.call_method('list_assets', asset_name.upper(), limit)
+        raw_data = await self.call_method('list_assets', asset_name.upper(), limit)
 
         try:
             return raw_data['result'][0]['id']
@@ -29,7 +20,7 @@ class Asset(GramBitshares):
         """
         Wallet method.
         """
-        raw_data = await self._gram.call_method('get_asset', asset_name_or_id)
+        raw_data = await self.call_method('get_asset', asset_name_or_id)
 
         try:
             return raw_data['result']
@@ -37,3 +28,27 @@ class Asset(GramBitshares):
             raise Exception(f'Got error while getting data for {asset_name_or_id}.')
         except KeyError:
             raise Exception(f'Got error while getting data for {asset_name_or_id}.')
+
+    async def lookup_asset_symbols(self, *asset_names):
+        """
+        Node method.
+        :return: list of asset objects or None for unknown symbols in the same order as asset_names.
+        """
+        raw_data = await self.call_method('lookup_asset_symbols', [name.upper() for name in asset_names])
+
+        try:
+            return raw_data['result']
+        except KeyError:
+            raise Exception(f'Got error while looking up assets {asset_names}.')
+
+    async def get_objects(self, *objects_ids):
+        """
+        Node method.
+        :return: list of objects or None for unknown ids in the same order as objects_ids.
+        """
+        raw_data = await self.call_method('get_objects', list(objects_ids))
+
+        try:
+            return raw_data['result']
+        except KeyError:
+            raise Exception(f'Got error while getting objects {objects_ids}.')
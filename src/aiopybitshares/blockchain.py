@@ -1,19 +1,10 @@
 # -*- coding: utf-8 -*-
-from .grambitshares import GramBitshares, default_node
+from .pooledgram import PooledGram
 
 
-class Blockchain(GramBitshares):
-    def __init__(self):
-        super().__init__()
-        self._gram = None
-
-    async def connect(self, ws_node=default_node):
-        self._gram = await super().connect(ws_node)
-
-        return self
-
+class Blockchain(PooledGram):
     async def get_global_properties(self, create_order_fee=False):
-        raw_data = await self._gram.call_method('get_global_properties')
+        raw_data = await self.call_method('get_global_properties')
 
         try:
             if create_order_fee:
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+import asyncio
+
+from collections import defaultdict
+from contextlib import asynccontextmanager
+
+from .grambitshares import GramBitshares, default_node
+from src.extra.baserin import BaseRin
+
+
+class ConnectionPool:
+    """
+    Process-wide pool of multiplexed connections keyed by URI.
+
+    acquire() hands out the least loaded live connection for the URI and opens a new one only when
+    every pooled connection already has calls in flight and the pool is not full. Connections which
+    are reconnecting are not handed out and do not count towards the pool size, so callers get a
+    healthy connection meanwhile. Connections are opened (and wallet unlocked) once, dropped when
+    they give up reconnecting and closed after idle_timeout seconds without use unless they carry
+    subscriptions.
+    """
+    def __init__(self, size=BaseRin.pool_size, idle_timeout=BaseRin.pool_idle_timeout):
+        self._size = size
+        self._idle_timeout = idle_timeout
+        self._conns = defaultdict(list)
+        self._locks = defaultdict(asyncio.Lock)
+        self._in_flight = defaultdict(int)
+        self._last_used = {}
+
+    @staticmethod
+    def _now():
+        return asyncio.get_event_loop().time()
+
+    def _is_evictable(self, conn, now):
+        return self._in_flight[conn] == 0 and not conn.has_subscriptions \
+               and now - self._last_used[conn] > self._idle_timeout
+
+    def _drop(self, uri, conn):
+        self._conns[uri].remove(conn)
+        self._in_flight.pop(conn, None)
+        self._last_used.pop(conn, None)
+
+        if not conn.closed:
+            asyncio.ensure_future(conn.close())
+
+    def _evict(self):
+        now = self._now()
+
+        for uri, conns in self._conns.items():
+            for conn in [conn for conn in conns if conn.closed or self._is_evictable(conn, now)]:
+                self._drop(uri, conn)
+
+    async def _get_connection(self, uri):
+        self._evict()
+
+        async with self._locks[uri]:
+            conns = self._conns[uri]
+            live_conns = [conn for conn in conns if conn.is_connected]
+            conn = min(live_conns, key=lambda x: self._in_flight[x], default=None)
+
+            if conn is None or (self._in_flight[conn] and len(live_conns) < self._size):
+                conn = await GramBitshares().connect(uri)
+                conns.append(conn)
+                self._last_used[conn] = self._now()
+
+            return conn
+
+    @asynccontextmanager
+    async def acquire(self, uri=default_node):
+        conn = await self._get_connection(uri)
+        self._in_flight[conn] += 1
+
+        try:
+            yield conn
+        finally:
+            self._in_flight[conn] -= 1
+            self._last_used[conn] = self._now()
+
+    async def close(self):
+        conns = [conn for conns in self._conns.values() for conn in conns if not conn.closed]
+        self._conns.clear()
+        self._in_flight.clear()
+        self._last_used.clear()
+
+        await asyncio.gather(*(conn.close() for conn in conns))
+
+
+pool = ConnectionPool()
+
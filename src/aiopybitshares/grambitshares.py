@@ -1,58 +1,276 @@
 # -*- coding: utf-8 -*-
+import re
+import random
+import logging
+import itertools
+import asyncio
+
 import ujson
 import aiohttp
 
-from aiohttp.client_exceptions import ClientConnectionError
+from aiohttp.client_exceptions import ClientConnectionError, ClientError
 
 from src.extra.baserin import BaseRin
 
 
 default_node = 'wss://bitshares.openledger.info/ws'
+heartbeat = 30
+response_id_pattern = re.compile(r'{"id":(\d+),')
+
+reconnect_delay = .1
+# Secs a call waits for reconnection before it fails, so callers may go to another node.
+connection_wait_timeout = .5
+max_reconnect_delay = 10
+call_retries = 3
+idempotent_methods_prefixes = ('get_', 'lookup_', 'list_', 'is_')
+
+
+def get_backoff_delay(attempt, delay=reconnect_delay, max_delay=max_reconnect_delay):
+    """
+    :return: exponential delay of attempt, counted from 0, with jitter in secs.
+    """
+    delay = min(max_delay, delay * 2 ** attempt)
+
+    return random.uniform(delay / 2, delay)
 
 
 class GramBitshares:
+    """
+    Multiplexed JSON-RPC client. Each call gets a unique id and waits on its own future,
+    a single reader task dispatches incoming responses by id, so one websocket can carry
+    any number of calls in flight. Notices of subscriptions are dispatched to callbacks
+    registered by subscribe(). Responses of calls made with raw=True are not decoded here,
+    they are passed to the caller as received.
+
+    When the socket dies the client reconnects in background with jittered exponential backoff,
+    unlocks the wallet and re-establishes subscriptions. Calls wait for the reconnection and
+    idempotent reads interrupted by it are retried. The client gives up and closes itself after
+    BaseRin.time_to_reconnect secs without success.
+    """
+    _logger = logging.getLogger('Rin.GramBitshares')
+
     def __init__(self, node=default_node):
         self._node = node
         self._ws = None
         self._session = None
+        self._reader = None
+        self._reconnector = None
+        self._is_closing = False
+        self._connected = asyncio.Event()
+        self._pending = {}
+        self._raw_ids = set()
+        self._callbacks = {}
+        self._subscriptions = {}
+        self._ids = itertools.count(1)
+
+    @property
+    def closed(self):
+        return self._is_closing or self._ws is None
+
+    @property
+    def is_connected(self):
+        """
+        False while the connection is reconnecting or closed.
+        """
+        return not self.closed and self._connected.is_set()
+
+    @property
+    def has_subscriptions(self):
+        return bool(self._callbacks)
 
     async def ws_connect(self, node=default_node):
         session = aiohttp.ClientSession()
 
         try:
-            self._ws = await session.ws_connect(node)
-        except ClientConnectionError:
+            self._ws = await session.ws_connect(node, heartbeat=heartbeat)
+        except ClientError:
             await session.close()
             raise
         else:
+            self._reader = asyncio.ensure_future(self._read_responses())
             return session
 
+    async def _resume_session(self):
+        if self._node == BaseRin.wallet_uri and await self.is_wallet_locked():
+            await self.unlock_wallet()
+
+        for callback_id, (method, args) in list(self._subscriptions.items()):
+            await self._call(method, (callback_id, *args))
+
+        self._connected.set()
+
     async def connect(self, ws_node=default_node):
-        gram = GramBitshares(ws_node)
-        self._session = await gram.ws_connect(ws_node)
-        self._ws = gram._ws
+        self._node = ws_node
+        self._session = await self.ws_connect(ws_node)
+        await self._resume_session()
 
-        if ws_node == BaseRin.wallet_uri and await self.is_wallet_locked():
-            await self.unlock_wallet()
+        return self
+
+    async def _reconnect(self):
+        loop = asyncio.get_event_loop()
+        time_end = loop.time() + BaseRin.time_to_reconnect
+        await self._session.close()
+
+        for attempt in itertools.count():
+            await asyncio.sleep(get_backoff_delay(attempt))
+
+            try:
+                self._session = await self.ws_connect(self._node)
+                await self._resume_session()
+            except asyncio.CancelledError:
+                raise
+            except Exception as err:
+                self._logger.warning(f'Reconnection to {self._node} failed: {type(err).__name__} {err}.')
+                await self._session.close()
+
+                if loop.time() < time_end:
+                    continue
+
+                self._logger.error(f'Could not reconnect to {self._node}, giving up.')
+                await self.close()
+            else:
+                self._logger.info(f'Reconnected to {self._node} after {attempt + 1} attempts.')
+
+            return
+
+    def _dispatch_notice(self, params):
+        callback = self._callbacks.get(params[0])
+
+        if callback is not None:
+            callback(params[1])
+
+    def _dispatch_response(self, data):
+        if data.get('method') == 'notice':
+            self._dispatch_notice(data['params'])
+            return
+
+        future = self._pending.pop(data.get('id'), None)
+
+        if future is not None and not future.done():
+            future.set_result(data)
+
+    def _dispatch_frame(self, frame):
+        match = response_id_pattern.match(frame)
 
-        return gram
+        if match is not None and int(match.group(1)) in self._raw_ids:
+            future = self._pending.pop(int(match.group(1)), None)
 
-    async def call_method(self, method, *args):
-        await self._ws.send_str(
-            ujson.dumps(
-                {'id': 0, 'method': '{}'.format(method), 'params': args}
+            if future is not None and not future.done():
+                future.set_result(frame)
+
+            return
+
+        self._dispatch_response(ujson.loads(frame))
+
+    def _fail_pending(self, err):
+        for future in self._pending.values():
+            if not future.done():
+                future.set_exception(err)
+
+        self._pending.clear()
+
+    async def _read_responses(self):
+        try:
+            async for msg in self._ws:
+                if msg.type == aiohttp.WSMsgType.TEXT:
+                    self._dispatch_frame(msg.data)
+
+                elif msg.type == aiohttp.WSMsgType.ERROR:
+                    break
+        finally:
+            self._connected.clear()
+            self._fail_pending(
+                ClientConnectionError(f'Connection to {self._node} closed.')
             )
-        )
 
-        return await self._ws.receive_json()
+            if not self._is_closing and (self._reconnector is None or self._reconnector.done()):
+                self._logger.warning(f'Connection to {self._node} lost, reconnecting.')
+                self._reconnector = asyncio.ensure_future(self._reconnect())
+
+    async def _call(self, method, args, raw=False):
+        request_id = next(self._ids)
+        future = asyncio.get_event_loop().create_future()
+        self._pending[request_id] = future
+
+        if raw:
+            self._raw_ids.add(request_id)
+
+        try:
+            await self._ws.send_str(
+                ujson.dumps(
+                    {'id': request_id, 'method': '{}'.format(method), 'params': args}
+                )
+            )
+
+            return await future
+        except ConnectionResetError as err:
+            raise ClientConnectionError(f'Connection to {self._node} closed.') from err
+        finally:
+            self._pending.pop(request_id, None)
+            self._raw_ids.discard(request_id)
+
+    async def _wait_for_connection(self):
+        if not self._is_closing:
+            try:
+                await asyncio.wait_for(self._connected.wait(), timeout=connection_wait_timeout)
+            except asyncio.TimeoutError:
+                raise ClientConnectionError(f'Connection to {self._node} is reconnecting.')
+
+        if self._is_closing:
+            raise ClientConnectionError(f'Connection to {self._node} closed.')
+
+    async def call_method(self, method, *args, raw=False):
+        """
+        :param raw: return response frame as is instead of decoded response.
+        """
+        retries = call_retries if method.startswith(idempotent_methods_prefixes) else 0
+
+        for attempt in itertools.count():
+            await self._wait_for_connection()
+
+            try:
+                return await self._call(method, args, raw)
+            except ClientConnectionError:
+                if attempt >= retries:
+                    raise
+
+    async def subscribe(self, method, callback, *args):
+        """
+        :param method: subscription method which takes callback id as first param.
+        :param callback: function which will be called with data of each notice.
+        :return: callback id which is required for unsubscribe().
+        """
+        callback_id = next(self._ids)
+        self._callbacks[callback_id] = callback
+
+        try:
+            await self.call_method(method, callback_id, *args)
+        except Exception:
+            del self._callbacks[callback_id]
+            raise
+
+        self._subscriptions[callback_id] = (method, args)
+
+        return callback_id
+
+    def unsubscribe(self, callback_id):
+        self._callbacks.pop(callback_id, None)
+        self._subscriptions.pop(callback_id, None)
 
     async def is_wallet_locked(self):
         return (
-            await self.call_method('is_locked')
+            await self._call('is_locked', ())
         )['result']
 
     async def unlock_wallet(self):
-        await self.call_method('unlock', BaseRin.wallet_pwd)
+        await self._call('unlock', (BaseRin.wallet_pwd,))
 
     async def close(self):
+        self._is_closing = True
+        self._connected.set()
+
+        for task in (self._reader, self._reconnector):
+            if task is not None and task is not asyncio.current_task():
+                task.cancel()
+
         await self._session.close()
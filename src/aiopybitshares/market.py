@@ -1,21 +1,143 @@
 # -*- coding: utf-8 -*-
-from .grambitshares import GramBitshares, default_node
+import numpy as np
 
+from .pooledgram import PooledGram
+from src.extra.baserin import BaseRin
 
-class Market(GramBitshares):
-    def __init__(self):
-        super().__init__()
-        self._gram = None
+try:
+    import orjson as fast_json
+except ImportError:
+    import ujson as fast_json
+
+
+class OrderBookDecoder:
+    """
+    Decodes get_order_book response frames into preallocated (depth, 3) buffer of
+    (price, quote, base) rows. The buffer is reused by every decoded frame, so one decoder
+    must be used per pair.
+    """
+    __slots__ = ['buffer', '_order_type']
+
+    def __init__(self, depth, order_type='asks'):
+        self.buffer = np.zeros((depth, 3), dtype=np.float64)
+        self._order_type = order_type
+
+    def __call__(self, frame):
+        """
+        :param frame: raw response frame or already decoded response.
+        :return: number of filled rows of the buffer.
+        """
+        data = fast_json.loads(frame) if isinstance(frame, (str, bytes)) else frame
+        orders = data['result'][self._order_type]
+        buffer = self.buffer
+        size = min(len(orders), len(buffer))
+
+        for i in range(size):
+            order = orders[i]
+            buffer[i, 0] = float(order['price'])
+            buffer[i, 1] = float(order['quote'])
+            buffer[i, 2] = float(order['base'])
+
+        return size
 
-    async def connect(self, ws_node=default_node):
-        self._gram = await super().connect(ws_node)
 
-        return self
+class Market(PooledGram):
+    def __init__(self):
+        super().__init__()
+        self._subscriptions = {}
 
     async def get_order_book(self, base, quote, order_type, limit=1):
-        data = await self._gram.call_method('get_order_book', base.upper(), quote.upper(), limit)
+        data = await self.call_method('get_order_book', base.upper(), quote.upper(), limit,
+                                      hedge=bool(BaseRin.hedge_requests))
 
         try:
             return data['result'][order_type]
         except Exception as err:
             raise Exception(f'Fail while getting result for pair {base}:{quote}.', err)
+
+    async def get_top_markets(self, limit=100):
+        """
+        Node method.
+        :return: list of tickers of markets with the biggest 24h volume.
+        """
+        data = await self.call_method('get_top_markets', limit)
+
+        try:
+            return data['result']
+        except KeyError:
+            raise Exception('Fail while getting top markets.')
+
+    async def get_24_volume(self, base, quote):
+        """
+        Node method.
+        :return: dict with base_volume and quote_volume of the market for the last 24h.
+        """
+        data = await self.call_method('get_24_volume', base.upper(), quote.upper())
+
+        try:
+            return data['result']
+        except KeyError:
+            raise Exception(f'Fail while getting volume for pair {base}:{quote}.')
+
+    async def get_ticker(self, base, quote):
+        """
+        Node method.
+        :return: ticker of the market, its latest price is amount of base paid for 1 quote.
+        """
+        data = await self.call_method('get_ticker', base.upper(), quote.upper())
+
+        try:
+            return data['result']
+        except KeyError:
+            raise Exception(f'Fail while getting ticker for pair {base}:{quote}.')
+
+    async def decode_order_book(self, base, quote, decoder):
+        """
+        :param decoder: OrderBookDecoder of the pair.
+        :return: number of orders decoded into decoder buffer.
+        """
+        frame = await self.call_method('get_order_book', base.upper(), quote.upper(), len(decoder.buffer),
+                                       hedge=bool(BaseRin.hedge_requests), raw=True)
+
+        try:
+            return decoder(frame)
+        except Exception as err:
+            raise Exception(f'Fail while getting result for pair {base}:{quote}.', err)
+
+    async def subscribe_to_market(self, base, quote, callback):
+        """
+        :param callback: function which will be called with list of changed market objects
+                         each time when market base:quote changes.
+        """
+        self._subscriptions[(base, quote)] = \
+            await self.subscribe('subscribe_to_market', callback, base.upper(), quote.upper())
+
+    async def unsubscribe_from_market(self, base, quote):
+        subscription = self._subscriptions.pop((base, quote), None)
+
+        # Subscription could fail or not be made yet.
+        if subscription is None:
+            return
+
+        gram, callback_id = subscription
+        gram.unsubscribe(callback_id)
+
+        if not gram.closed:
+            await gram.call_method('unsubscribe_from_market', base.upper(), quote.upper())
+
+    async def set_subscribe_callback(self, callback, clear_filter=False):
+        """
+        :param callback: function which will be called with list of changed objects.
+        :param clear_filter: whether to clear the subscription filter on the node.
+        """
+        self._subscriptions['objects'] = \
+            await self.subscribe('set_subscribe_callback', callback, clear_filter)
+
+    async def close(self):
+        for key in list(self._subscriptions):
+            if key == 'objects':
+                gram, callback_id = self._subscriptions.pop(key)
+                gram.unsubscribe(callback_id)
+                continue
+
+            await self.unsubscribe_from_market(*key)
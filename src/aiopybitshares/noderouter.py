@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+import time
+import logging
+import asyncio
+
+from datetime import datetime
+from collections import deque
+
+from .connectionpool import pool
+from src.extra.baserin import BaseRin
+
+
+class NodeRouter:
+    """
+    Routes read calls over several nodes.
+
+    Every node is probed each probe_interval secs by get_dynamic_global_properties, which gives its
+    RTT and head block age. Calls go to the healthy node with the lowest median RTT. A hedged call is
+    duplicated to the second best node if the first one has not answered within its p95 RTT and
+    the first answer wins. Calls and probes which are not answered within a few p95 RTTs time out.
+    A node that fails or times out a call is unhealthy until the next successful probe.
+    """
+    _logger = logging.getLogger('Rin.NodeRouter')
+    _probe_interval = 10
+    _max_head_block_age = 15
+    _samples_num = 100
+    # Timeout of calls is this many p95 RTTs of the node, within min and max timeouts.
+    _timeout_factor = 4
+    _min_timeout = 2
+    _max_timeout = 10
+
+    def __init__(self, nodes=BaseRin.node_uris):
+        self._nodes = nodes
+        self._rtts = {node: deque(maxlen=self._samples_num) for node in nodes}
+        self._head_block_ages = {}
+        self._unhealthy = set()
+        self._prober = None
+
+    def _get_rtt_percentile(self, node, percentile):
+        rtts = sorted(self._rtts[node])
+
+        if not rtts:
+            return float('inf')
+
+        return rtts[min(int(len(rtts) * percentile), len(rtts) - 1)]
+
+    def get_rtt(self, node):
+        """
+        :return: median RTT of node in secs.
+        """
+        return self._get_rtt_percentile(node, .5)
+
+    def get_deadline(self, node):
+        """
+        :return: p95 RTT of node in secs after which a hedged call is duplicated
+                 or None while there are no samples.
+        """
+        if not self._rtts[node]:
+            return None
+
+        return self._get_rtt_percentile(node, .95)
+
+    def get_timeout(self, node):
+        """
+        :return: secs after which a call to node is failed.
+        """
+        deadline = self.get_deadline(node)
+
+        if deadline is None:
+            return self._max_timeout
+
+        return min(max(deadline * self._timeout_factor, self._min_timeout), self._max_timeout)
+
+    def get_nodes(self):
+        """
+        :return: healthy nodes sorted by median RTT or all nodes if none of them is healthy.
+        """
+        nodes = [node for node in self._nodes if node not in self._unhealthy] or self._nodes
+
+        return sorted(nodes, key=self.get_rtt)
+
+    @staticmethod
+    async def _call(node, method, *args, raw=False):
+        async with pool.acquire(node) as gram:
+            return await gram.call_method(method, *args, raw=raw)
+
+    async def _timed_call(self, node, method, *args, raw=False):
+        time_start = time.monotonic()
+
+        try:
+            result = await asyncio.wait_for(self._call(node, method, *args, raw=raw), self.get_timeout(node))
+        except asyncio.CancelledError:
+            raise
+        except asyncio.TimeoutError:
+            self._unhealthy.add(node)
+            raise asyncio.TimeoutError(f'Call {method} timed out on {node}.')
+        except Exception:
+            self._unhealthy.add(node)
+            raise
+
+        self._rtts[node].append(time.monotonic() - time_start)
+
+        return result
+
+    async def _probe(self, node):
+        try:
+            result = (await self._timed_call(node, 'get_dynamic_global_properties'))['result']
+            head_block_time = datetime.strptime(result['time'], '%Y-%m-%dT%H:%M:%S')
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            self._unhealthy.add(node)
+            self._logger.warning(f'Node {node} is unavailable.')
+            return
+
+        head_block_age = (datetime.utcnow() - head_block_time).total_seconds()
+        self._head_block_ages[node] = head_block_age
+
+        if head_block_age > self._max_head_block_age:
+            self._unhealthy.add(node)
+            self._logger.warning(f'Node {node} is behind by {head_block_age}s.')
+        else:
+            self._unhealthy.discard(node)
+
+    async def _probe_node(self, node):
+        while True:
+            await self._probe(node)
+            await asyncio.sleep(self._probe_interval)
+
+    async def _probe_nodes(self):
+        # Each node is probed on its own, so a slow node does not delay updates of the others.
+        await asyncio.gather(
+            *(self._probe_node(node) for node in self._nodes)
+        )
+
+    def _start_probing(self):
+        if self._prober is None and len(self._nodes) > 1:
+            self._prober = asyncio.ensure_future(self._probe_nodes())
+
+    async def _hedged_call(self, nodes, method, *args, raw=False):
+        first_call = asyncio.ensure_future(self._timed_call(nodes[0], method, *args, raw=raw))
+        done, _ = await asyncio.wait({first_call}, timeout=self.get_deadline(nodes[0]))
+
+        if done and first_call.exception() is None:
+            return first_call.result()
+
+        calls = {asyncio.ensure_future(self._timed_call(nodes[1], method, *args, raw=raw))}
+
+        if not done:
+            calls.add(first_call)
+
+        try:
+            while calls:
+                done, calls = await asyncio.wait(calls, return_when=asyncio.FIRST_COMPLETED)
+                succeeded = [call for call in done if call.exception() is None]
+
+                if succeeded or not calls:
+                    return (succeeded or list(done))[0].result()
+        finally:
+            for call in calls:
+                call.cancel()
+
+    async def call_method(self, method, *args, hedge=False, raw=False):
+        """
+        :param hedge: duplicate call to the second best node after p95 deadline.
+        :param raw: return response frame as is instead of decoded response.
+        """
+        self._start_probing()
+        nodes = self.get_nodes()
+
+        if hedge and len(nodes) > 1:
+            return await self._hedged_call(nodes, method, *args, raw=raw)
+
+        for node in nodes[:-1]:
+            try:
+                return await self._timed_call(node, method, *args, raw=raw)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                self._logger.warning(f'Call {method} failed on {node}, retrying on next node.')
+
+        return await self._timed_call(nodes[-1], method, *args, raw=raw)
+
+    async def get_node(self):
+        self._start_probing()
+
+        return self.get_nodes()[0]
+
+    async def close(self):
+        if self._prober is not None:
+            self._prober.cancel()
+            self._prober = None
+
+
+router = NodeRouter()
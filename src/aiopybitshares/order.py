@@ -1,35 +1,92 @@
 # -*- coding: utf-8 -*-
-from .grambitshares import GramBitshares, default_node
+import logging
+import asyncio
+
+from .pooledgram import PooledGram
 from src.extra.customexceptions import OrderNotFilled, AuthorizedAsset, UnknownOrderException
 
 
-class Order(GramBitshares):
+class Order(PooledGram):
+    _logger = logging.getLogger('Rin.Order')
+    # Errors of the wallet are prefixed with 'unspecified: ', errors of the node are not.
     error_msgs = {
-        'unspecified: Assert Exception: !op.fill_or_kill || filled: ': OrderNotFilled,
-        'unspecified: Assert Exception: is_authorized_asset': AuthorizedAsset,
+        'Assert Exception: !op.fill_or_kill || filled: ': OrderNotFilled,
+        'Assert Exception: is_authorized_asset': AuthorizedAsset,
     }
-
-    def __init__(self):
-        super().__init__()
-        self._gram = None
-
-    async def connect(self, ws_node=default_node):
-        self._gram = await super().connect(ws_node)
-
-        return self
+    limit_order_create_op = 1
+    max_expiration = '2106-02-07T06:28:15'
+    fee_asset = 'BTS'
 
     async def _find_and_raise_specific_exception(self, received_err_msg):
         for err_msg, exception in self.error_msgs.items():
-            if received_err_msg.startswith(err_msg):
+            if received_err_msg.startswith((err_msg, f'unspecified: {err_msg}')):
                 raise exception
 
         raise UnknownOrderException
 
-    async def create_order(self, *args):
-        raw_data = await self._gram.call_method('sell_asset', *args)
-        print(raw_data)
-        try:
-            raw_data['result']
+    async def _get_result(self, method, *args):
+        raw_data = await self.call_method(method, *args)
 
+        try:
+            return raw_data['result']
         except KeyError:
             await self._find_and_raise_specific_exception(raw_data['error']['message'])
+
+    async def get_account_id(self, account_name):
+        """
+        Wallet method.
+        """
+        raw_data = await self.call_method('get_account', account_name)
+
+        try:
+            return raw_data['result']['id']
+        except KeyError:
+            raise Exception(f'Got error while getting {account_name} id.')
+
+    @classmethod
+    def make_limit_order_create(cls, seller_id, amount_to_sell, sell_asset_id, min_to_receive, receive_asset_id,
+                                fill_or_kill=True):
+        """
+        :param amount_to_sell: integer amount in the smallest units of sell asset.
+        :param min_to_receive: integer amount in the smallest units of receive asset.
+        :return: limit_order_create operation without fee, it is set by the wallet.
+        """
+        return [
+            cls.limit_order_create_op,
+            {
+                'fee': {'amount': 0, 'asset_id': '1.3.0'},
+                'seller': seller_id,
+                'amount_to_sell': {'amount': amount_to_sell, 'asset_id': sell_asset_id},
+                'min_to_receive': {'amount': min_to_receive, 'asset_id': receive_asset_id},
+                'expiration': cls.max_expiration,
+                'fill_or_kill': fill_or_kill,
+                'extensions': [],
+            }
+        ]
+
+    async def create_orders(self, *operations):
+        """
+        Wallet method. Places all operations in one transaction built by the wallet transaction builder,
+        so they are broadcast together and are all applied or all rejected by the node. Builder calls
+        are served by the wallet itself, only the broadcast goes to the node.
+        :param operations: operations made by make_limit_order_create, in order of execution.
+        :return: signed transaction.
+        """
+        handle = await self._get_result('begin_builder_transaction')
+
+        try:
+            for operation in operations:
+                await self._get_result('add_operation_to_builder_transaction', handle, operation)
+
+            await self._get_result('set_fees_on_builder_transaction', handle, self.fee_asset)
+
+            return await self._get_result('sign_builder_transaction', handle, True)
+
+        finally:
+            # Failed cleanup must not mask result of the transaction.
+            try:
+                await self.call_method('remove_builder_transaction', handle)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                self._logger.exception(f'Could not remove builder transaction {handle}.')
@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+from .connectionpool import pool
+from .noderouter import router
+
+
+class PooledGram:
+    """
+    Base class for api wrappers. Calls are made through the shared pool, so connect() only
+    remembers the URI and close() has nothing to release. Without URI calls are routed
+    over the configured nodes.
+    """
+    def __init__(self):
+        self._node = None
+
+    async def connect(self, ws_node=None):
+        self._node = ws_node
+
+        return self
+
+    async def call_method(self, method, *args, hedge=False, raw=False):
+        """
+        :param hedge: duplicate call to the second best node if the first one is slow,
+                      only for calls routed over the configured nodes.
+        :param raw: return response frame as is instead of decoded response.
+        """
+        if self._node is None:
+            return await router.call_method(method, *args, hedge=hedge, raw=raw)
+
+        async with pool.acquire(self._node) as gram:
+            return await gram.call_method(method, *args, raw=raw)
+
+    async def subscribe(self, method, callback, *args):
+        """
+        Subscriptions live on the connection they were made on.
+        :return: tuple of connection and callback id.
+        """
+        node = self._node or await router.get_node()
+
+        async with pool.acquire(node) as gram:
+            return gram, await gram.subscribe(method, callback, *args)
+
+    async def close(self):
+        pass
@@ -0,0 +1,291 @@
+# -*- coding: utf-8 -*-
+import time
+import struct
+import hashlib
+import asyncio
+
+from datetime import datetime, timezone
+from binascii import hexlify, unhexlify
+
+from .order import Order
+
+try:
+    import ecdsa
+except ImportError:
+    ecdsa = None
+
+
+base58_alphabet = b'123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz'
+time_format = '%Y-%m-%dT%H:%M:%S'
+# Serializers of supported operations by operation id.
+operations_serializers = {}
+
+
+def varint(n):
+    data = bytearray()
+
+    while n >= 0x80:
+        data.append(n & 0x7f | 0x80)
+        n >>= 7
+
+    data.append(n)
+
+    return bytes(data)
+
+
+def object_instance(object_id):
+    """
+    :param object_id: id like 1.2.29, only instance is serialized.
+    """
+    return varint(int(object_id.rsplit('.', 1)[1]))
+
+
+def time_point_sec(time_str):
+    return struct.pack('<I', int(datetime.strptime(time_str, time_format).replace(tzinfo=timezone.utc).timestamp()))
+
+
+def asset_amount(amount):
+    return struct.pack('<q', int(amount['amount'])) + object_instance(amount['asset_id'])
+
+
+def serialize_limit_order_create(op):
+    return b''.join((
+        asset_amount(op['fee']),
+        object_instance(op['seller']),
+        asset_amount(op['amount_to_sell']),
+        asset_amount(op['min_to_receive']),
+        time_point_sec(op['expiration']),
+        struct.pack('<?', op['fill_or_kill']),
+        varint(0),
+    ))
+
+
+operations_serializers[Order.limit_order_create_op] = serialize_limit_order_create
+
+
+def serialize_transaction(tx):
+    """
+    :param tx: transaction in json form of the node, signatures are not serialized.
+    :return: bytes of transaction as they are signed.
+    """
+    data = [
+        struct.pack('<HI', tx['ref_block_num'], tx['ref_block_prefix']),
+        time_point_sec(tx['expiration']),
+        varint(len(tx['operations'])),
+    ]
+
+    for op_id, op in tx['operations']:
+        try:
+            serializer = operations_serializers[op_id]
+        except KeyError:
+            raise ValueError(f'Serialization of operation {op_id} is not supported.')
+
+        data.append(varint(op_id))
+        data.append(serializer(op))
+
+    data.append(varint(0))
+
+    return b''.join(data)
+
+
+def base58_decode(data):
+    n = 0
+
+    for char in data.encode():
+        n = n * 58 + base58_alphabet.index(char)
+
+    raw = n.to_bytes((n.bit_length() + 7) // 8, 'big')
+
+    return b'\x00' * (len(data) - len(data.lstrip('1'))) + raw
+
+
+def wif_to_secret(wif):
+    """
+    :return: 32 bytes of private key.
+    """
+    raw = base58_decode(wif)
+    key, checksum = raw[:-4], raw[-4:]
+
+    if len(key) != 33 or key[0] != 0x80 or hashlib.sha256(hashlib.sha256(key).digest()).digest()[:4] != checksum:
+        raise ValueError('Invalid WIF key.')
+
+    return key[1:]
+
+
+def is_canonical(signature):
+    """
+    :param signature: 64 bytes of r and s, as the node requires them.
+    """
+    return not (
+        signature[0] & 0x80 or (signature[0] == 0 and not signature[1] & 0x80) or
+        signature[32] & 0x80 or (signature[32] == 0 and not signature[33] & 0x80)
+    )
+
+
+def get_signing_key(wif):
+    return ecdsa.SigningKey.from_string(wif_to_secret(wif), curve=ecdsa.SECP256k1)
+
+
+def sign_digest(signing_key, digest):
+    """
+    Deterministic signature, nonces are derived by RFC 6979 with counter as extra entropy
+    until the signature is canonical.
+    :return: 65 bytes of compact signature with recovery id.
+    """
+    order = ecdsa.SECP256k1.order
+    secret = signing_key.privkey.secret_multiplier
+    e = int.from_bytes(digest, 'big')
+
+    for counter in range(1, 1 << 16):
+        k = ecdsa.rfc6979.generate_k(
+            order, secret, hashlib.sha256, digest, extra_entropy=counter.to_bytes(4, 'little')
+        )
+        point = k * ecdsa.SECP256k1.generator
+        r = point.x()
+
+        if r >= order:
+            continue
+
+        s = ecdsa.numbertheory.inverse_mod(k, order) * (e + r * secret) % order
+        recovery_id = point.y() & 1
+
+        # Node accepts only low s.
+        if s > order // 2:
+            s = order - s
+            recovery_id ^= 1
+
+        signature = r.to_bytes(32, 'big') + s.to_bytes(32, 'big')
+
+        if s and is_canonical(signature):
+            # 27 - compact signature, 4 - compressed public key.
+            return bytes((27 + 4 + recovery_id,)) + signature
+
+    raise ValueError('Could not get canonical signature.')
+
+
+def recover_public_key(signature, digest):
+    """
+    :return: 33 bytes of compressed public key which made the compact signature.
+    """
+    recovery_id = signature[0] - 27 - 4
+    keys = ecdsa.VerifyingKey.from_public_key_recovery_with_digest(
+        signature[1:], digest, ecdsa.SECP256k1, hashfunc=hashlib.sha256
+    )
+
+    return keys[recovery_id].to_string('compressed')
+
+
+def get_digest(chain_id, tx):
+    return hashlib.sha256(unhexlify(chain_id) + serialize_transaction(tx)).digest()
+
+
+class Signer(Order):
+    """
+    Places orders without the wallet: transactions are built, serialized and signed by the active key
+    of the account here and broadcast to the node. Chain id, fee of limit_order_create and reference
+    block are got from the node and cached, so placing orders takes a single request.
+
+    Requires ecdsa package.
+    """
+    _ref_block_ttl = 60
+    _fee_ttl = 3600
+    _expiration = 30
+    _core_asset_id = '1.3.0'
+
+    def __init__(self, wif):
+        """
+        :param wif: active private key of the account in WIF.
+        """
+        super().__init__()
+
+        if ecdsa is None:
+            raise ImportError('Local signer requires ecdsa package.')
+
+        self._signing_key = get_signing_key(wif)
+        self._chain_id = None
+        self._fee = None
+        self._fee_updated_at = 0
+        self._ref_block = None
+        self._ref_block_updated_at = 0
+
+    async def get_account_id(self, account_name):
+        """
+        Node method.
+        """
+        raw_data = await self.call_method('get_account_by_name', account_name)
+
+        try:
+            return raw_data['result']['id']
+        except (KeyError, TypeError):
+            raise Exception(f'Got error while getting {account_name} id.')
+
+    async def _get_chain_id(self):
+        if self._chain_id is None:
+            self._chain_id = await self._get_result('get_chain_id')
+
+        return self._chain_id
+
+    async def _get_fee(self):
+        """
+        :return: fee of limit_order_create in core asset.
+        """
+        if time.time() - self._fee_updated_at > self._fee_ttl:
+            fees = (await self._get_result('get_global_properties'))['parameters']['current_fees']
+            fee = dict(fees['parameters'])[self.limit_order_create_op]['fee']
+            self._fee = fee * fees['scale'] // 10000
+            self._fee_updated_at = time.time()
+
+        return self._fee
+
+    async def _get_ref_block(self):
+        """
+        :return: tuple of ref block num, ref block prefix and head block time in secs.
+        """
+        if time.time() - self._ref_block_updated_at > self._ref_block_ttl:
+            props = await self._get_result('get_dynamic_global_properties')
+            self._ref_block = (
+                props['head_block_number'] & 0xffff,
+                struct.unpack_from('<I', unhexlify(props['head_block_id']), 4)[0],
+                datetime.strptime(props['time'], time_format).replace(tzinfo=timezone.utc).timestamp()
+            )
+            self._ref_block_updated_at = time.time()
+
+        return self._ref_block
+
+    async def build_transaction(self, *operations):
+        """
+        :param operations: operations made by make_limit_order_create.
+        :return: unsigned transaction.
+        """
+        (ref_block_num, ref_block_prefix, head_block_time), fee, _ = await asyncio.gather(
+            self._get_ref_block(), self._get_fee(), self._get_chain_id()
+        )
+        # Head block time of the node moves on with local time since the ref block was got.
+        expiration = head_block_time + time.time() - self._ref_block_updated_at + self._expiration
+
+        for _, op in operations:
+            op['fee'] = {'amount': fee, 'asset_id': self._core_asset_id}
+
+        return {
+            'ref_block_num': ref_block_num,
+            'ref_block_prefix': ref_block_prefix,
+            'expiration': datetime.fromtimestamp(int(expiration), timezone.utc).strftime(time_format),
+            'operations': list(operations),
+            'extensions': [],
+        }
+
+    def sign_transaction(self, tx, chain_id):
+        tx['signatures'] = [hexlify(sign_digest(self._signing_key, get_digest(chain_id, tx))).decode()]
+
+        return tx
+
+    async def create_orders(self, *operations):
+        """
+        Node method. Operations are broadcast in one transaction, they are all applied or all rejected.
+        :param operations: operations made by make_limit_order_create, in order of execution.
+        :return: signed transaction.
+        """
+        tx = self.sign_transaction(await self.build_transaction(*operations), await self._get_chain_id())
+        await self._get_result('call', 'network_broadcast', 'broadcast_transaction', [tx])
+
+        return tx
@@ -1,5 +1,4 @@
 # -*- coding: utf-8 -*-
-import math
 import numpy as np
 
 from dataclasses import dataclass
@@ -7,6 +6,27 @@ from dataclasses import dataclass
 
 DTYPE_FLOAT64 = np.float64
 
+EMPTY_ARR = np.empty(0, dtype=DTYPE_FLOAT64)
+EMPTY_ARR.flags.writeable = False
+
+
+class AlgorithmBuffers:
+    """
+    Scratch buffers of one chain which are reused by every run of ArbitrationAlgorithm for it,
+    so the algorithm doesn't allocate arrays while it works.
+
+    :param precisions_arr: 1D array which contains precisions for each asset in pair of chain.
+    :param depth: max number of orders in each pair book.
+    """
+    __slots__ = ['orders_data', 'level', 'vols_sum', 'vols', 'multipliers']
+
+    def __init__(self, precisions_arr, depth=1):
+        self.orders_data = np.zeros((3, depth, 3), dtype=DTYPE_FLOAT64)
+        self.level = np.zeros((3, 3), dtype=DTYPE_FLOAT64)
+        self.vols_sum = np.zeros((3, 3), dtype=DTYPE_FLOAT64)
+        self.vols = np.zeros((3, 2), dtype=DTYPE_FLOAT64)
+        self.multipliers = 10. ** np.asarray(precisions_arr, dtype=DTYPE_FLOAT64).reshape(3, 2)
+
 
 @dataclass(repr=False, eq=False)
 class ArbitrationAlgorithm:
@@ -28,6 +48,8 @@ class ArbitrationAlgorithm:
 
     :return:            If profit >= _profit_limit - will be returned tuple of 3D array with volumes for placing orders
                         and and calculated profit , else tuple of empty array and calculated profit.
+                        Volumes array is a buffer of AlgorithmBuffers, it is valid until the next run with
+                        the same buffers.
 
     @@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@@
     Short Description:  Ex: There is chain BTS:CNY CNY:USD USD:BTS. We need to sell BTS for CNY , then CNY for USD and
@@ -36,6 +58,11 @@ class ArbitrationAlgorithm:
 
                         Also this algorithm has a little feature. He can sum orders. It works not only on the most
                         latest orders in the glass, but also it works in depth.
+
+                        By default orders are summed greedily level by level until profit stops growing. With
+                        optimal=True books of each pair are turned into piecewise-linear curves of cumulative
+                        received volume, the curves are composed through the chain with fees and the volume
+                        which gives max profit is searched among all their breakpoints.
     """
     __slots__ = ['_orders_data', '_vol_limit', '_bts_default_fee', '_assets_fees', '_profit_limit', '_precisions_arr']
 
@@ -47,138 +74,173 @@ class ArbitrationAlgorithm:
     _precisions_arr: np.ndarray
 
     async def __call__(self):
-        return await self._run_data_through_algo()
+        return self.run()
 
-    @staticmethod
-    def round_half_up(number, decimals):
-        multiplier = 10 ** decimals
-        return math.floor(number * multiplier + 0.5) / multiplier
+    def run(self, buffers=None, optimal=False):
+        """
+        Synchronous version of the algorithm, doesn't change _orders_data.
 
-    async def _round_vols_to_specific_prec(self, vols_arr: np.ndarray) -> np.ndarray:
-        flatten_vols_arr = vols_arr.flatten()
-        vols_arr_with_precs = np.fromiter(
-            (self.round_half_up(vol, prec) for vol, prec in zip(flatten_vols_arr, self._precisions_arr)),
-            dtype=DTYPE_FLOAT64)
+        :param buffers: AlgorithmBuffers of the chain, if None - new buffers will be allocated.
+        :param optimal: search the most profitable volume instead of summing orders greedily.
+        """
+        if buffers is None:
+            buffers = AlgorithmBuffers(self._precisions_arr)
 
-        return vols_arr_with_precs
+        if optimal:
+            return self._run_data_through_optimizer(buffers)
 
-    async def _prepare_orders_arr(self, arr: np.ndarray, profit: DTYPE_FLOAT64) -> tuple:
-        vols_arr_without_prices = np.array([
-            *((el[2], el[1]) for el in arr)
-        ], dtype=DTYPE_FLOAT64)
-        rounded_vols_arr = await self._round_vols_to_specific_prec(vols_arr_without_prices)
+        return self._run_data_through_algo(buffers)
 
-        return rounded_vols_arr.reshape(3, 2), profit
+    @staticmethod
+    def _round_vols_to_specific_prec(vols_sum: np.ndarray, buffers: AlgorithmBuffers) -> np.ndarray:
+        vols = buffers.vols
+        vols[:, 0] = vols_sum[:, 2]
+        vols[:, 1] = vols_sum[:, 1]
 
-    async def _is_profit_valid(self, profit: DTYPE_FLOAT64) -> bool:
-        return profit > self._profit_limit
+        np.multiply(vols, buffers.multipliers, out=vols)
+        vols += 0.5
+        np.floor(vols, out=vols)
+        np.divide(vols, buffers.multipliers, out=vols)
 
-    async def _recalculate_vols_given_fees(self, pairs_arr: np.ndarray) -> tuple:
-        new_quote0 = pairs_arr[0][1] - pairs_arr[0][1] * self._assets_fees[0] / 100
-        pairs_arr[1][2] = new_quote0
-        pairs_arr[1][1] = pairs_arr[1][2] / pairs_arr[1][0]
-        new_quote1 = pairs_arr[1][1] - pairs_arr[1][2] / pairs_arr[1][0] * self._assets_fees[1] / 100
-        pairs_arr[2][2] = new_quote1
-        pairs_arr[2][1] = pairs_arr[2][2] / pairs_arr[2][0]
-        new_quote2 = pairs_arr[2][1] - pairs_arr[2][2] / pairs_arr[2][0] * self._assets_fees[2] / 100
+        return vols
 
-        arr_with_final_vols = np.array([pairs_arr[0][2], new_quote2], dtype=DTYPE_FLOAT64)
+    def _recalculate_vols_given_fees(self, pairs_arr: np.ndarray) -> DTYPE_FLOAT64:
+        new_quote0 = pairs_arr[0, 1] - pairs_arr[0, 1] * self._assets_fees[0] / 100
+        pairs_arr[1, 2] = new_quote0
+        pairs_arr[1, 1] = pairs_arr[1, 2] / pairs_arr[1, 0]
+        new_quote1 = pairs_arr[1, 1] - pairs_arr[1, 2] / pairs_arr[1, 0] * self._assets_fees[1] / 100
+        pairs_arr[2, 2] = new_quote1
+        pairs_arr[2, 1] = pairs_arr[2, 2] / pairs_arr[2, 0]
+        new_quote2 = pairs_arr[2, 1] - pairs_arr[2, 2] / pairs_arr[2, 0] * self._assets_fees[2] / 100
 
-        return arr_with_final_vols, pairs_arr
+        return new_quote2
 
     @staticmethod
-    async def _fill_prices_with_zero(arr: np.ndarray) -> np.ndarray:
-        arr[::1, 0] = 0
+    def _compare_vols_second_step(pairs_arr: np.ndarray):
+        if pairs_arr[1, 1] > pairs_arr[2, 2]:
+            pairs_arr[1, 1] = pairs_arr[2, 2]
+            pairs_arr[1, 2] = pairs_arr[1, 1] * pairs_arr[1, 0]
+            pairs_arr[0, 1] = pairs_arr[1, 2]
+            pairs_arr[0, 2] = pairs_arr[0, 1] * pairs_arr[0, 0]
 
-        return arr
+        elif pairs_arr[1, 1] < pairs_arr[2, 2]:
+            pairs_arr[2, 2] = pairs_arr[1, 1]
+            pairs_arr[2, 1] = pairs_arr[2, 2] / pairs_arr[2, 0]
 
     @staticmethod
-    async def _compare_vols_second_step(pair0_arr: np.ndarray, pair1_arr: np.ndarray,
-                                        pair2_arr: np.ndarray) -> tuple:
-        if pair1_arr[1] > pair2_arr[2]:
-            pair1_arr[1] = pair2_arr[2]
-            pair1_arr[2] = pair1_arr[1] * pair1_arr[0]
-            pair0_arr[1] = pair1_arr[2]
-            pair0_arr[2] = pair0_arr[1] * pair0_arr[0]
+    def _compare_vols_first_step(pairs_arr: np.ndarray):
+        if pairs_arr[0, 1] > pairs_arr[1, 2]:
+            pairs_arr[0, 1] = pairs_arr[1, 2]
+            pairs_arr[0, 2] = pairs_arr[0, 1] * pairs_arr[0, 0]
 
-        elif pair1_arr[1] < pair2_arr[2]:
-            pair2_arr[2] = pair1_arr[1]
-            pair2_arr[1] = pair2_arr[2] / pair2_arr[0]
-
-        return pair0_arr, pair1_arr, pair2_arr
+        elif pairs_arr[0, 1] < pairs_arr[1, 2]:
+            pairs_arr[1, 2] = pairs_arr[0, 1]
+            pairs_arr[1, 1] = pairs_arr[1, 2] / pairs_arr[1, 0]
 
     @staticmethod
-    async def _compare_vols_first_step(pair0_arr: np.ndarray, pair1_arr: np.ndarray) -> tuple:
-        if pair0_arr[1] > pair1_arr[2]:
-            pair0_arr[1] = pair1_arr[2]
-            pair0_arr[2] = pair0_arr[1] * pair0_arr[0]
+    def _compare_base_vol_and_vol_limit(pairs_arr: np.ndarray, vol_limit: DTYPE_FLOAT64):
+        if pairs_arr[0, 2] > vol_limit:
+            pairs_arr[0, 2] = vol_limit
+            pairs_arr[0, 1] = pairs_arr[0, 2] / pairs_arr[0, 0]
+
+    def _get_profit(self, pairs_arr: np.ndarray, vol_limit: DTYPE_FLOAT64) -> DTYPE_FLOAT64:
+        """
+        Recalculates volumes of one level of orders in place, fills its prices with zero
+        and returns profit of the level.
+        """
+        self._compare_base_vol_and_vol_limit(pairs_arr, vol_limit)
+        self._compare_vols_first_step(pairs_arr)
+        self._compare_vols_second_step(pairs_arr)
+        init_vol = pairs_arr[0, 2]
+        final_vol = self._recalculate_vols_given_fees(pairs_arr)
+        pairs_arr[:, 0] = 0
 
-        elif pair0_arr[1] < pair1_arr[2]:
-            pair1_arr[2] = pair0_arr[1]
-            pair1_arr[1] = pair1_arr[2] / pair1_arr[0]
+        return final_vol - init_vol - self._bts_default_fee
 
-        return pair0_arr, pair1_arr
+    def _run_data_through_algo(self, buffers: AlgorithmBuffers) -> tuple:
+        vols_sum, level = buffers.vols_sum, buffers.level
+        np.copyto(vols_sum, self._orders_data[:, 0])
+        profit = self._get_profit(vols_sum, self._vol_limit)
 
-    @staticmethod
-    async def _compare_base_vol_and_vol_limit(pair0_arr: np.ndarray, vol_limit: DTYPE_FLOAT64) -> np.ndarray:
-        if pair0_arr[2] > vol_limit:
-            pair0_arr[2] = vol_limit
-            pair0_arr[1] = pair0_arr[2] / pair0_arr[0]
+        for i in range(1, self._orders_data.shape[1]):
+            if vols_sum[0, 2] >= self._vol_limit:
+                break
 
-        return pair0_arr
+            np.copyto(level, self._orders_data[:, i])
+            new_profit = self._get_profit(level, self._vol_limit - vols_sum[0, 2])
 
-    async def _recalculate_vols_within_fees(self, pair0_arr: np.ndarray, pair1_arr: np.ndarray,
-                                            pair2_arr: np.ndarray, vol_limit: DTYPE_FLOAT64) -> np.ndarray:
-        pair0_arr = await self._compare_base_vol_and_vol_limit(pair0_arr, vol_limit)
-        pair0_arr, pair1_arr = await self._compare_vols_first_step(pair0_arr, pair1_arr)
-        pair0_arr, pair1_arr, pair2_arr = await self._compare_vols_second_step(pair0_arr, pair1_arr, pair2_arr)
-        arr = np.array([pair0_arr, pair1_arr, pair2_arr], dtype=DTYPE_FLOAT64)
+            if profit > new_profit:
+                break
 
-        return arr
+            vols_sum += level
+            profit = new_profit
 
-    async def _get_profit(self, init_vol, final_vol):
-        return final_vol - init_vol - self._bts_default_fee
+        if profit > self._profit_limit:
+            return self._round_vols_to_specific_prec(vols_sum, buffers), profit
 
-    async def _basic_algo(self, pair0_arr: np.ndarray, pair1_arr: np.ndarray,
-                          pair2_arr: np.ndarray) -> tuple:
-        pairs_arr = await self._recalculate_vols_within_fees(pair0_arr, pair1_arr, pair2_arr, self._vol_limit)
-        final_vols, pairs_arrs_given_fees = await self._recalculate_vols_given_fees(pairs_arr)
-        pairs_arrs_given_fees = await self._fill_prices_with_zero(pairs_arrs_given_fees)
+        return EMPTY_ARR, profit
 
-        return final_vols, pairs_arrs_given_fees
+    def _get_cumulative_curves(self) -> tuple:
+        """
+        :return: tuple of 2D arrays (3, depth + 1) with cumulative base volumes and cumulative quote volumes
+                 of books of each pair.
+        """
+        shape = (3, self._orders_data.shape[1] + 1)
+        base_curves = np.zeros(shape, dtype=DTYPE_FLOAT64)
+        quote_curves = np.zeros(shape, dtype=DTYPE_FLOAT64)
 
-    async def _ext_algo(self, arr: np.ndarray, pair0_arr: np.ndarray, pair1_arr: np.ndarray,
-                        pair2_arr: np.ndarray) -> np.ndarray or tuple:
-        if arr[0][2] >= self._vol_limit:
-            return np.delete(arr, np.s_[:])
+        np.cumsum(self._orders_data[:, :, 2], axis=1, out=base_curves[:, 1:])
+        np.cumsum(self._orders_data[:, :, 1], axis=1, out=quote_curves[:, 1:])
 
-        new_vol_limit = self._vol_limit - arr[0][2]
-        pairs_arr = await self._recalculate_vols_within_fees(pair0_arr, pair1_arr, pair2_arr, new_vol_limit)
-        final_vols, pairs_arrs_given_fees = await self._recalculate_vols_given_fees(pairs_arr)
-        vols_sum = await self._fill_prices_with_zero(arr + pairs_arrs_given_fees)
+        return base_curves, quote_curves
 
-        return final_vols, vols_sum
+    def _get_quote_vols_given_fee(self, quote_vols, i):
+        return quote_vols - quote_vols * self._assets_fees[i] / 100
 
-    async def _run_data_through_algo(self) -> tuple:
-        len_any_arr = len(self._orders_data[0])
-        algo_data = await self._basic_algo(self._orders_data[0][0], self._orders_data[1][0], self._orders_data[2][0])
-        profit = await self._get_profit(*algo_data[0])
+    def _get_final_vols(self, vols: np.ndarray, base_curves: np.ndarray, quote_curves: np.ndarray) -> np.ndarray:
+        for i in range(3):
+            vols = self._get_quote_vols_given_fee(np.interp(vols, base_curves[i], quote_curves[i]), i)
 
-        for i in range(1, len_any_arr):
-            new_algo_data = await self._ext_algo(algo_data[1], self._orders_data[0][i],
-                                                 self._orders_data[1][i], self._orders_data[2][i])
-            if len(new_algo_data) == 0:
-                break
+        return vols
 
-            new_profit = await self._get_profit(*new_algo_data[0])
+    def _get_init_vols(self, vols: np.ndarray, i: int, base_curves: np.ndarray, quote_curves: np.ndarray):
+        """
+        Maps base volumes of pair i back to base volumes of the first pair which give them.
+        """
+        for j in range(i - 1, -1, -1):
+            vols = np.interp(vols / (1 - self._assets_fees[j] / 100), quote_curves[j], base_curves[j])
 
-            if profit > new_profit:
-                break
+        return vols
 
-            algo_data = new_algo_data
-            profit = new_profit
+    def _run_data_through_optimizer(self, buffers: AlgorithmBuffers) -> tuple:
+        base_curves, quote_curves = self._get_cumulative_curves()
+
+        # Profit is piecewise-linear in volume of the first order, so its max lies on a breakpoint of one of
+        # the curves. Breakpoints of the second and third pairs are mapped back to volumes of the first one.
+        breakpoints = [self._get_init_vols(base_curves[i], i, base_curves, quote_curves) for i in range(3)]
+        max_vol = min(self._vol_limit, *(pair_breakpoints[-1] for pair_breakpoints in breakpoints))
+
+        vols = np.concatenate((*breakpoints, (max_vol,)))
+        vols = vols[vols <= max_vol]
+
+        # Volumes are rounded down, so they don't exceed the books and the volume limit after rounding.
+        multiplier = buffers.multipliers[0, 0]
+        vols = np.floor(vols * multiplier) / multiplier
+        profits = self._get_final_vols(vols, base_curves, quote_curves) - vols - self._bts_default_fee
+
+        best = profits.argmax()
+        profit = profits[best]
+
+        if not (vols[best] > 0 and profit > self._profit_limit):
+            return EMPTY_ARR, profit
+
+        vols_sum = buffers.vols_sum
+        vols_sum[0, 2] = vols[best]
+
+        for i in range(3):
+            vols_sum[i, 1] = np.interp(vols_sum[i, 2], base_curves[i], quote_curves[i])
 
-        if await self._is_profit_valid(profit):
-            return await self._prepare_orders_arr(algo_data[1], profit)
+            if i < 2:
+                vols_sum[i + 1, 2] = self._get_quote_vols_given_fee(vols_sum[i, 1], i)
 
-        return np.delete(algo_data[1], np.s_[:]), profit
+        return self._round_vols_to_specific_prec(vols_sum, buffers), profit
@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+import numpy as np
+
+from dataclasses import dataclass
+
+
+DTYPE_FLOAT64 = np.float64
+
+
+@dataclass(repr=False, eq=False)
+class BatchArbitrationAlgorithm:
+    """
+    Vectorized version of ArbitrationAlgorithm which checks many chains at once. For every chain it gives
+    the same volumes and profit as ArbitrationAlgorithm, see its description for the algorithm itself.
+
+    _orders_data:       4D array (chains, 3, depth, 3) which contains orders data (price, quote volume,
+                        base volume) for each pair of each chain.
+
+    _vol_limits:        1D array of max volume limits of order for first (core) asset in first pair of each chain.
+
+    _bts_default_fees:  1D array of BTS default fees for placing orders multiplied by 3 converted to
+                        core (first) asset in first pair of each chain.
+
+    _assets_fees:       2D array (chains, 3) which contains market fees for each second asset in pair of chain.
+
+    _profit_limits:     1D array of min profit limits of each chain.
+
+    _precisions_arr:    2D array (chains, 6) which contains precisions for each asset in pair of chain.
+
+    _depths:            1D array of numbers of valid orders of each chain, if chains have books of different
+                        depth. If None - all orders of _orders_data are valid.
+
+    :return:            Tuple of 3D array (chains, 3, 2) with rounded volumes for placing orders, 1D array of
+                        profits and 1D bool array which is True for chains where profit > profit limit.
+    """
+    __slots__ = ['_orders_data', '_vol_limits', '_bts_default_fees', '_assets_fees', '_profit_limits',
+                 '_precisions_arr', '_depths']
+
+    _orders_data: np.ndarray
+    _vol_limits: np.ndarray
+    _bts_default_fees: np.ndarray
+    _assets_fees: np.ndarray
+    _profit_limits: np.ndarray
+    _precisions_arr: np.ndarray
+    _depths: np.ndarray
+
+    def __call__(self):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return self._run_data_through_algo()
+
+    @staticmethod
+    def _compare_base_vol_and_vol_limit(pair0_arr: np.ndarray, vol_limits: np.ndarray):
+        mask = pair0_arr[:, 2] > vol_limits
+        pair0_arr[mask, 2] = vol_limits[mask]
+        pair0_arr[mask, 1] = pair0_arr[mask, 2] / pair0_arr[mask, 0]
+
+    @staticmethod
+    def _compare_vols_first_step(pair0_arr: np.ndarray, pair1_arr: np.ndarray):
+        greater = pair0_arr[:, 1] > pair1_arr[:, 2]
+        less = pair0_arr[:, 1] < pair1_arr[:, 2]
+
+        pair0_arr[greater, 1] = pair1_arr[greater, 2]
+        pair0_arr[greater, 2] = pair0_arr[greater, 1] * pair0_arr[greater, 0]
+
+        pair1_arr[less, 2] = pair0_arr[less, 1]
+        pair1_arr[less, 1] = pair1_arr[less, 2] / pair1_arr[less, 0]
+
+    @staticmethod
+    def _compare_vols_second_step(pair0_arr: np.ndarray, pair1_arr: np.ndarray, pair2_arr: np.ndarray):
+        greater = pair1_arr[:, 1] > pair2_arr[:, 2]
+        less = pair1_arr[:, 1] < pair2_arr[:, 2]
+
+        pair1_arr[greater, 1] = pair2_arr[greater, 2]
+        pair1_arr[greater, 2] = pair1_arr[greater, 1] * pair1_arr[greater, 0]
+        pair0_arr[greater, 1] = pair1_arr[greater, 2]
+        pair0_arr[greater, 2] = pair0_arr[greater, 1] * pair0_arr[greater, 0]
+
+        pair2_arr[less, 2] = pair1_arr[less, 1]
+        pair2_arr[less, 1] = pair2_arr[less, 2] / pair2_arr[less, 0]
+
+    def _recalculate_vols_within_fees(self, pairs_arr: np.ndarray, vol_limits: np.ndarray):
+        self._compare_base_vol_and_vol_limit(pairs_arr[:, 0], vol_limits)
+        self._compare_vols_first_step(pairs_arr[:, 0], pairs_arr[:, 1])
+        self._compare_vols_second_step(pairs_arr[:, 0], pairs_arr[:, 1], pairs_arr[:, 2])
+
+    @staticmethod
+    def _recalculate_vols_given_fees(pairs_arr: np.ndarray, assets_fees: np.ndarray) -> np.ndarray:
+        new_quote0 = pairs_arr[:, 0, 1] - pairs_arr[:, 0, 1] * assets_fees[:, 0] / 100
+        pairs_arr[:, 1, 2] = new_quote0
+        pairs_arr[:, 1, 1] = pairs_arr[:, 1, 2] / pairs_arr[:, 1, 0]
+        new_quote1 = pairs_arr[:, 1, 1] - pairs_arr[:, 1, 2] / pairs_arr[:, 1, 0] * assets_fees[:, 1] / 100
+        pairs_arr[:, 2, 2] = new_quote1
+        pairs_arr[:, 2, 1] = pairs_arr[:, 2, 2] / pairs_arr[:, 2, 0]
+        new_quote2 = pairs_arr[:, 2, 1] - pairs_arr[:, 2, 2] / pairs_arr[:, 2, 0] * assets_fees[:, 2] / 100
+
+        return new_quote2
+
+    def _process_level(self, pairs_arr: np.ndarray, vol_limits: np.ndarray, assets_fees: np.ndarray,
+                       bts_default_fees: np.ndarray) -> np.ndarray:
+        """
+        Clamps volumes of one level of orders of each chain in place and returns profits of the level.
+        """
+        self._recalculate_vols_within_fees(pairs_arr, vol_limits)
+        init_vols = pairs_arr[:, 0, 2].copy()
+        final_vols = self._recalculate_vols_given_fees(pairs_arr, assets_fees)
+        pairs_arr[:, :, 0] = 0
+
+        return final_vols - init_vols - bts_default_fees
+
+    def _round_vols_to_specific_prec(self, vols_arr: np.ndarray) -> np.ndarray:
+        multipliers = 10. ** self._precisions_arr.reshape(vols_arr.shape)
+
+        return np.floor(vols_arr * multipliers + 0.5) / multipliers
+
+    def _run_data_through_algo(self) -> tuple:
+        chains_num, _, depth, _ = self._orders_data.shape
+        depths = np.full(chains_num, depth) if self._depths is None else self._depths
+
+        vols_sum = self._orders_data[:, :, 0, :].copy()
+        profits = self._process_level(vols_sum, self._vol_limits, self._assets_fees, self._bts_default_fees)
+        active = np.ones(chains_num, dtype=bool)
+
+        for i in range(1, depth):
+            active &= (i < depths) & ~(vols_sum[:, 0, 2] >= self._vol_limits)
+            chains = np.flatnonzero(active)
+
+            if not chains.size:
+                break
+
+            pairs_arr = self._orders_data[chains, :, i, :]
+            new_profits = self._process_level(pairs_arr, self._vol_limits[chains] - vols_sum[chains, 0, 2],
+                                              self._assets_fees[chains], self._bts_default_fees[chains])
+            accepted = ~(profits[chains] > new_profits)
+            active[chains[~accepted]] = False
+
+            chains = chains[accepted]
+            vols_sum[chains] += pairs_arr[accepted]
+            profits[chains] = new_profits[accepted]
+
+        vols_arr = self._round_vols_to_specific_prec(vols_sum[:, :, [2, 1]])
+
+        return vols_arr, profits, profits > self._profit_limits
@@ -0,0 +1,235 @@
+# -*- coding: utf-8 -*-
+import math
+import numpy as np
+
+from collections import namedtuple
+
+
+DTYPE_FLOAT64 = np.float64
+
+Cycle = namedtuple('Cycle', ['chain', 'fees', 'profit'])
+
+
+class MarketGraph:
+    """
+    Directed graph of markets which finds profitable cycles of 2..max_legs pairs.
+
+    Pair A:B is an edge A -> B with weight -log(1 / price * (1 - fee / 100)), where price is the best
+    price of the pair book (amount of A paid for 1 B) and fee is market fee of B in percents. Sum of
+    weights along a cycle is negative if and only if going around it gives more of the start asset than
+    was spent, so profitable cycles are negative cycles of the graph.
+
+    Cycles are searched by Bellman-Ford limited to max_legs rounds from each start asset, every round
+    relaxes all edges at once with numpy. Walks are not allowed to return to the start asset before the
+    last leg and cycles visiting any asset twice are skipped, so only simple cycles are emitted. For each
+    start asset, number of legs and closing pair only the most profitable walk is kept, so this is a fast
+    screen of the graph rather than enumeration of all cycles.
+
+    Search is incremental: an edge can only be used by cycles of a start asset if its tail is reachable
+    from the start asset in less than max_legs legs, so after set_edge() or remove_edge() only start
+    assets which reach the changed edge are searched again.
+
+    For 3 legs the screen is exact per closing pair: every walk start -> asset -> asset2 -> start is simple,
+    so if no cycle is found through pair asset2:start, no chain closed by this pair is profitable at best
+    prices, and since deeper orders only have worse prices, at any volume. screen_chains() relies on it.
+
+    :param start_assets: assets from which cycles may start, e.g. core assets which have volume limits.
+    :param max_legs: max number of pairs in cycle.
+    """
+    def __init__(self, start_assets, max_legs=3):
+        self._start_assets = list(start_assets)
+        self._max_legs = max_legs
+        self._assets = {}
+        self._edges = {}
+        self._pairs = []
+        self._tails = []
+        self._heads = []
+        self._weights = []
+        self._fees = []
+        self._reachable = {}
+        self._cycles = {}
+        self._dirty = set(self._start_assets)
+        self._min_profit = None
+
+    def __len__(self):
+        return len(self._edges)
+
+    def add_start_asset(self, asset):
+        if asset not in self._start_assets:
+            self._start_assets.append(asset)
+            self._dirty.add(asset)
+
+    def _get_asset_index(self, asset):
+        index = self._assets.get(asset)
+
+        if index is None:
+            index = self._assets[asset] = len(self._assets)
+
+        return index
+
+    def _mark_dirty(self, tail):
+        for start_asset in self._start_assets:
+            reachable = self._reachable.get(start_asset)
+
+            if reachable is None or (tail < len(reachable) and reachable[tail]):
+                self._dirty.add(start_asset)
+
+    def set_edge(self, pair, price, fee=0.):
+        """
+        :param pair: str like 'A:B'.
+        :param price: best price of the pair book, amount of A paid for 1 B.
+        :param fee: market fee of B in percents.
+        """
+        if not price > 0 or fee >= 100:
+            self.remove_edge(pair)
+            return
+
+        weight = math.log(price) - math.log1p(-fee / 100)
+        index = self._edges.get(pair)
+
+        if index is None:
+            tail, head = map(self._get_asset_index, pair.split(':'))
+            index = self._edges[pair] = len(self._pairs)
+            self._pairs.append(pair)
+            self._tails.append(tail)
+            self._heads.append(head)
+            self._weights.append(weight)
+            self._fees.append(fee)
+
+        elif self._weights[index] == weight and self._fees[index] == fee:
+            return
+
+        else:
+            self._weights[index] = weight
+            self._fees[index] = fee
+
+        self._mark_dirty(self._tails[index])
+
+    def remove_edge(self, pair):
+        index = self._edges.get(pair)
+
+        if index is None or self._weights[index] == math.inf:
+            return
+
+        self._weights[index] = math.inf
+        self._mark_dirty(self._tails[index])
+
+    def _get_cycle(self, edges):
+        tails = [self._tails[edge] for edge in edges]
+
+        if len(set(tails)) != len(tails):
+            return None
+
+        weight = sum(self._weights[edge] for edge in edges)
+
+        return Cycle(
+            tuple(self._pairs[edge] for edge in edges),
+            np.array([self._fees[edge] for edge in edges], dtype=DTYPE_FLOAT64),
+            math.expm1(-weight)
+        )
+
+    def _search_cycles(self, start, tails, heads, weights, max_weight):
+        assets_num = len(self._assets)
+        dists = np.full((self._max_legs + 1, assets_num), np.inf, dtype=DTYPE_FLOAT64)
+        parents = np.full((self._max_legs + 1, assets_num), -1)
+        dists[0, start] = 0
+        cycles = {}
+
+        for legs in range(1, self._max_legs + 1):
+            candidates = dists[legs - 1, tails] + weights
+            np.minimum.at(dists[legs], heads, candidates)
+
+            relaxed = np.flatnonzero(np.isfinite(candidates) & (candidates == dists[legs, heads]))
+            parents[legs, heads[relaxed]] = relaxed
+
+            if legs > 1:
+                for edge in np.flatnonzero((heads == start) & (candidates < max_weight)):
+                    path = [edge]
+
+                    for prev_legs in range(legs - 1, 0, -1):
+                        path.append(parents[prev_legs, tails[path[-1]]])
+
+                    cycle = self._get_cycle(path[::-1])
+
+                    if cycle is not None:
+                        cycles[cycle.chain] = cycle
+
+            # Walks must not pass through the start asset before the last leg.
+            dists[legs, start] = np.inf
+
+        return list(cycles.values()), np.isfinite(dists[:self._max_legs]).any(axis=0)
+
+    def _update_cycles(self, min_profit):
+        max_weight = -math.log1p(min_profit)
+        tails = np.array(self._tails, dtype=np.int64)
+        heads = np.array(self._heads, dtype=np.int64)
+        weights = np.array(self._weights, dtype=DTYPE_FLOAT64)
+
+        for start_asset in self._dirty:
+            start = self._assets.get(start_asset)
+
+            if start is None:
+                self._cycles[start_asset], self._reachable[start_asset] = [], None
+                continue
+
+            self._cycles[start_asset], self._reachable[start_asset] = \
+                self._search_cycles(start, tails, heads, weights, max_weight)
+
+        self._dirty.clear()
+
+    def find_cycles(self, min_profit=0.):
+        """
+        :param min_profit: min profit of cycle as a fraction of spent volume of the start asset.
+        :return: list of Cycle(chain, fees, profit) sorted by profit, where chain is tuple of pairs like
+                 ('A:B', 'B:C', 'C:A') and fees is array of market fees of each second asset of pair.
+        """
+        if min_profit != self._min_profit:
+            self._min_profit = min_profit
+            self._dirty.update(self._start_assets)
+
+        if self._dirty:
+            self._update_cycles(min_profit)
+
+        return sorted(
+            (cycle for cycles in self._cycles.values() for cycle in cycles),
+            key=lambda cycle: cycle.profit, reverse=True
+        )
+
+    def get_profit(self, chain):
+        """
+        :return: profit of going around chain at best prices as a fraction of spent volume, -1 if any pair
+                 of chain has no price, nan if any pair is not in the graph.
+        """
+        try:
+            weight = sum(self._weights[self._edges[pair]] for pair in chain)
+        except KeyError:
+            return math.nan
+
+        return math.expm1(-weight)
+
+    def screen_chains(self, chains, min_profit=0.):
+        """
+        Chains of 3 pairs from start assets whose closing pair has no cycle with min_profit are screened out.
+        Other chains and chains with a pair without price are kept, so they are checked as usual.
+
+        :param chains: seq of chains, each chain is tuple of pairs like ('A:B', 'B:C', 'C:A').
+        :return: tuple of list of kept chains and dict of screened out chains and their profits at best prices.
+        """
+        closing_pairs = {cycle.chain[-1] for cycle in self.find_cycles(min_profit) if len(cycle.chain) == 3}
+        kept_chains = []
+        screened_chains = {}
+
+        start_assets = set(self._start_assets)
+
+        for chain in chains:
+            profit = math.nan
+
+            if len(chain) == 3 and chain[-1] not in closing_pairs and chain[0].split(':')[0] in start_assets:
+                profit = self.get_profit(chain)
+
+            if profit > -1:
+                screened_chains[chain] = profit
+            else:
+                kept_chains.append(chain)
+
+        return kept_chains, screened_chains
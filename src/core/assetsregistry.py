@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+import time
+import logging
+import asyncio
+
+import ujson
+
+from src.extra.baserin import BaseRin
+from src.extra import utils
+
+from src.aiopybitshares.asset import Asset
+
+
+class AssetsRegistry(BaseRin):
+    """
+    Id, symbol, precision and market fee of assets.
+
+    Assets are bulk loaded from the node by lookup_asset_symbols / get_objects batches, kept in dicts
+    and saved to the output dir. The saved cache is reused until it is older than 'assets cache ttl'.
+    Symbols and ids unknown to the node are remembered for the same time. Lookups made while a batch
+    is loaded are gathered into the next batch.
+    """
+    _logger = logging.getLogger('Rin.AssetsRegistry')
+    _cache_file = utils.get_file(BaseRin.output_dir, 'assets.json')
+    _batch_size = 100
+
+    def __init__(self, ttl=BaseRin.assets_cache_ttl):
+        """
+        :param ttl: hours.
+        """
+        self._ttl = ttl * 3600
+        self._lock = asyncio.Lock()
+        self._updated_at = time.time()
+        self._by_id = {}
+        self._by_symbol = {}
+        self._unknown = set()
+        self._pending = {'_by_id': set(), '_by_symbol': set()}
+        self._read_cache()
+
+    def _add_asset(self, asset):
+        data = {
+            'id': asset['id'],
+            'symbol': asset['symbol'],
+            'precision': asset['precision'],
+            'market_fee_percent': asset['options']['market_fee_percent'],
+        }
+        self._by_id[data['id']] = self._by_symbol[data['symbol']] = data
+
+    def _read_cache(self):
+        try:
+            with open(self._cache_file, 'r') as f:
+                cache = ujson.load(f)
+        except (FileNotFoundError, ValueError):
+            return
+
+        if time.time() - cache['updated_at'] < self._ttl:
+            self._updated_at = cache['updated_at']
+            self._by_id = cache['assets']
+            self._by_symbol = {asset['symbol']: asset for asset in self._by_id.values()}
+
+    def _write_cache(self):
+        with open(self._cache_file, 'w') as f:
+            ujson.dump({'updated_at': self._updated_at, 'assets': self._by_id}, f)
+
+    def _expire(self):
+        if time.time() - self._updated_at > self._ttl:
+            self._updated_at = time.time()
+            self._by_id = {}
+            self._by_symbol = {}
+            self._unknown = set()
+
+    async def _load(self, method, keys, registry_attr):
+        self._expire()
+        known = getattr(self, registry_attr)
+        keys = [key for key in keys if key not in known and key not in self._unknown]
+
+        if not keys:
+            return
+
+        pending = self._pending[registry_attr]
+        pending.update(keys)
+
+        async with self._lock:
+            known = getattr(self, registry_attr)
+            missing = [key for key in pending if key not in known and key not in self._unknown]
+            pending.clear()
+
+            if not missing:
+                return
+
+            asset_obj = await Asset().connect()
+            batches = [missing[i:i + self._batch_size] for i in range(0, len(missing), self._batch_size)]
+
+            try:
+                results = await asyncio.gather(
+                    *(getattr(asset_obj, method)(*batch) for batch in batches)
+                )
+            except BaseException:
+                # Callers waiting for the lock load them again.
+                pending.update(missing)
+                raise
+            finally:
+                await asset_obj.close()
+
+            for asset in (asset for result in results for asset in result if asset):
+                self._add_asset(asset)
+
+            unknown = [
+                key for batch, result in zip(batches, results)
+                for key, asset in zip(batch, result) if not asset
+            ]
+            self._unknown.update(unknown)
+
+            self._write_cache()
+            self._logger.info(f'Loaded {len(missing) - len(unknown)} assets, {len(unknown)} unknown, '
+                              f'{len(self._by_id)} assets in registry.')
+
+    async def load_symbols(self, symbols):
+        await self._load('lookup_asset_symbols', (symbol.upper() for symbol in symbols), '_by_symbol')
+
+    async def load_ids(self, ids):
+        await self._load('get_objects', ids, '_by_id')
+
+    async def _get_asset(self, asset_name_or_id):
+        if asset_name_or_id.startswith('1.3.'):
+            await self.load_ids((asset_name_or_id,))
+            asset = self._by_id.get(asset_name_or_id)
+        else:
+            await self.load_symbols((asset_name_or_id,))
+            asset = self._by_symbol.get(asset_name_or_id.upper())
+
+        if asset is None:
+            raise Exception(f'Got error while getting data for {asset_name_or_id}.')
+
+        return asset
+
+    async def get_id(self, asset_name):
+        return (await self._get_asset(asset_name))['id']
+
+    async def get_precision(self, asset_name_or_id):
+        return (await self._get_asset(asset_name_or_id))['precision']
+
+    async def get_market_fee_percent(self, asset_name_or_id):
+        """
+        :return: market fee in percents.
+        """
+        return (await self._get_asset(asset_name_or_id))['market_fee_percent'] / 100
+
+
+assets_registry = AssetsRegistry()
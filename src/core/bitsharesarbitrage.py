@@ -1,14 +1,17 @@
 # -*- coding: utf-8 -*-
 import os
 import re
-import time
+import math
 import logging
+import time
 import itertools
 import asyncio
 
 import numpy as np
 
 from datetime import datetime as dt
+from decimal import Decimal
+from collections import defaultdict, Counter
 
 from aiohttp.client_exceptions import ClientConnectionError
 
@@ -16,13 +19,337 @@ from src.extra.baserin import BaseRin
 from src.extra.customexceptions import OrderNotFilled, AuthorizedAsset, EmptyOrdersList, UnknownOrderException
 from src.extra import utils
 
-from src.aiopybitshares.market import Market
 from src.aiopybitshares.order import Order
+from src.aiopybitshares.grambitshares import get_backoff_delay
 from src.aiopybitshares.asset import Asset
+from src.aiopybitshares.signer import Signer
 
-from src.algorithms.arbitryalgorithm import ArbitrationAlgorithm
+from src.algorithms.arbitryalgorithm import ArbitrationAlgorithm, AlgorithmBuffers
+from src.algorithms.batcharbitryalgorithm import BatchArbitrationAlgorithm
+from src.algorithms.marketgraph import MarketGraph
 
 from .limitsandfees import ChainsWithGatewayPairFees, VolLimits, DefaultBTSFee
+from .orderbookstore import OrderBookStore
+from .assetsregistry import assets_registry
+from .chainsscores import ChainsScores
+
+
+class PairsTickScheduler:
+    """
+    Polls order books for a set of chains. Each tick fetches due pairs once with bounded concurrency,
+    so chains sharing a pair share its single request. Then only chains with a pair whose book version
+    changed since the last tick are checked, chains with more changed pairs go first.
+
+    With requests per second budget, the budget is split between pairs proportionally to weights of
+    their hottest chains (see ChainsScores), so hot chains are polled often and cold chains rarely,
+    but at least once per _max_poll_interval. Without budget every pair is polled each tick.
+
+    With screening, best prices of changed books are put to MarketGraph and changed chains which can not
+    be profitable at best prices are not checked, their profits at best prices are taken as their margins.
+    """
+    _logger = logging.getLogger('Rin.PairsTickScheduler')
+    _report_every = 100
+    _max_poll_interval = 300
+    _max_idle_time = 1
+
+    def __init__(self, order_books, check_chains, concurrency=BaseRin.requests_concurrency,
+                 requests_per_second=BaseRin.requests_per_second, scores=None, screen=BaseRin.screen_chains):
+        """
+        :param order_books: OrderBookStore instance.
+        :param check_chains: coroutine function which takes dict of chains and their args and returns
+                             tuple of chains which must be removed and dict of margins of checked chains.
+        :param concurrency: max number of order books fetched at once.
+        :param requests_per_second: budget of order book requests, 0 - no limit.
+        :param scores: ChainsScores instance.
+        :param screen: whether to screen changed chains by MarketGraph before checking them.
+        """
+        self._order_books = order_books
+        self._check_chains = check_chains
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._requests_per_second = requests_per_second
+        self._scores = ChainsScores() if scores is None else scores
+        self._graph = MarketGraph(()) if screen else None
+        self._pairs_fees = {}
+        self._tokens = requests_per_second
+        self._tokens_updated_at = asyncio.get_event_loop().time()
+        self._pairs_intervals = {}
+        self._pairs_weights = {}
+        self._next_polls = {}
+        self._books_changed = asyncio.Event()
+        self._chain_added = asyncio.Event()
+        self._chains = {}
+        self._pairs_index = defaultdict(list)
+        self._pairs_versions = {}
+        self._dirty_chains = Counter()
+        self._ticks_count = 0
+        self._ticks_duration = 0
+        self.evaluations_performed = 0
+        self.evaluations_skipped = 0
+        self.evaluations_screened = 0
+
+    @property
+    def dedup_ratio(self):
+        """
+        Ratio of legs of all chains to unique pairs actually fetched per tick.
+        """
+        pairs_num = len(self._pairs_index)
+
+        return sum(map(len, self._pairs_index.values())) / pairs_num if pairs_num else 0
+
+    def _set_edge(self, pair):
+        try:
+            book = self._order_books.get_book(pair)
+        except EmptyOrdersList:
+            book = ()
+
+        if len(book):
+            self._graph.set_edge(pair, book[0, 0], self._pairs_fees[pair])
+        else:
+            self._graph.remove_edge(pair)
+
+    def _set_chain_args(self, chain, args):
+        self._chains[chain] = args
+
+        if self._graph is None:
+            return
+
+        self._graph.add_start_asset(chain[0].split(':')[0])
+
+        for pair, fee in zip(chain, args[0]):
+            self._pairs_fees[pair] = float(fee)
+
+            # Edges of new pairs are set by the tick which sees their first version.
+            if pair in self._pairs_versions:
+                self._set_edge(pair)
+
+    def _index_chain(self, chain, args):
+        self._set_chain_args(chain, args)
+        self._dirty_chains[chain] += len(chain)
+        self._chain_added.set()
+
+        for pair in chain:
+            self._pairs_index[pair].append(chain)
+
+    def _unindex_chain(self, chain):
+        del self._chains[chain]
+        self._dirty_chains.pop(chain, None)
+
+        for pair in chain:
+            self._pairs_index[pair].remove(chain)
+
+            if not self._pairs_index[pair]:
+                del self._pairs_index[pair]
+                self._pairs_versions.pop(pair, None)
+                self._pairs_intervals.pop(pair, None)
+                self._pairs_weights.pop(pair, None)
+                self._next_polls.pop(pair, None)
+                self._pairs_fees.pop(pair, None)
+
+                if self._graph is not None:
+                    self._graph.remove_edge(pair)
+
+    async def _watch_chain(self, chain):
+        async with self._semaphore:
+            await self._order_books.watch(chain, self._books_changed)
+
+    async def add_chain(self, chain, *args):
+        if chain in self._chains:
+            return
+
+        await self._watch_chain(chain)
+        self._index_chain(chain, args)
+
+    async def _unwatch_unused_pairs(self, chains):
+        # All chains share the same event, so only pairs which no chain uses anymore are unwatched.
+        await self._order_books.unwatch(
+            {pair for chain in chains for pair in chain if pair not in self._pairs_index}, self._books_changed
+        )
+
+    async def remove_chain(self, chain):
+        self._unindex_chain(chain)
+        await self._unwatch_unused_pairs([chain])
+
+    async def swap_chains(self, chains):
+        """
+        Replaces all chains with the given ones. Order books of new chains are loaded first, then chains
+        and their args are replaced without awaits in between, so no tick sees a mix of old and new chains.
+
+        :param chains: dict of chains and their args.
+        :return: tuple of numbers of added and removed chains.
+        """
+        new_chains = [chain for chain in chains if chain not in self._chains]
+        results = await asyncio.gather(
+            *(self._watch_chain(chain) for chain in new_chains), return_exceptions=True
+        )
+        failed_chains = set()
+
+        for chain, result in zip(new_chains, results):
+            if isinstance(result, Exception):
+                self._logger.warning(f'Could not load order books of chain {chain}, it will be added later.')
+                failed_chains.add(chain)
+
+        removed_chains = [chain for chain in self._chains if chain not in chains]
+
+        for chain in removed_chains:
+            self._unindex_chain(chain)
+
+        for chain, args in chains.items():
+            if chain in self._chains:
+                self._set_chain_args(chain, args)
+            elif chain not in failed_chains:
+                self._index_chain(chain, args)
+
+        self._update_intervals()
+        await self._unwatch_unused_pairs(removed_chains + list(failed_chains))
+
+        return len(new_chains) - len(failed_chains), len(removed_chains)
+
+    async def _refresh_pair(self, pair):
+        async with self._semaphore:
+            try:
+                await self._order_books.refresh(pair)
+            except Exception:
+                self._logger.exception(f'Error while refreshing order book for {pair}.')
+
+    def _report(self, tick_duration):
+        self._logger.info(f'Tick #{self._ticks_count}: {len(self._chains)} chains, '
+                          f'{len(self._pairs_index)} pairs, dedup ratio {self.dedup_ratio:.2f}, '
+                          f'evaluations performed {self.evaluations_performed}, '
+                          f'skipped {self.evaluations_skipped} ({self.evaluations_screened} screened out), '
+                          f'last tick {tick_duration:.3f}s, '
+                          f'avg tick {self._ticks_duration / self._ticks_count:.3f}s.')
+
+    def _update_intervals(self):
+        if not self._requests_per_second:
+            return
+
+        chains_weights = {chain: self._scores.get_weight(chain) for chain in self._chains}
+        self._pairs_weights = {
+            pair: max(chains_weights[chain] for chain in chains) for pair, chains in self._pairs_index.items()
+        }
+        weights_sum = sum(self._pairs_weights.values())
+
+        for pair, weight in self._pairs_weights.items():
+            self._pairs_intervals[pair] = min(weights_sum / (weight * self._requests_per_second),
+                                              self._max_poll_interval)
+
+    def _get_due_pairs(self, now):
+        due_pairs = [pair for pair in self._pairs_index if self._next_polls.get(pair, 0) <= now]
+
+        if not self._requests_per_second:
+            return due_pairs
+
+        self._tokens = min(self._requests_per_second,
+                           self._tokens + (now - self._tokens_updated_at) * self._requests_per_second)
+        self._tokens_updated_at = now
+
+        due_pairs.sort(key=lambda pair: self._pairs_weights.get(pair, 1), reverse=True)
+        due_pairs = due_pairs[:int(self._tokens)]
+        self._tokens -= len(due_pairs)
+
+        return due_pairs
+
+    def _get_idle_time(self, now):
+        next_poll = min(self._next_polls.values(), default=now)
+        next_token = now + (1 - self._tokens) / self._requests_per_second
+
+        return min(max(next_poll, next_token) - now, self._max_idle_time)
+
+    async def _tick(self):
+        now = asyncio.get_event_loop().time()
+        due_pairs = self._get_due_pairs(now)
+
+        if not due_pairs:
+            await asyncio.sleep(self._get_idle_time(now) if self._requests_per_second else 0)
+            return
+
+        await asyncio.gather(
+            *(self._refresh_pair(pair) for pair in due_pairs)
+        )
+
+        for pair in due_pairs:
+            self._next_polls[pair] = now + self._pairs_intervals.get(pair, 0)
+
+        for pair, chains in self._pairs_index.items():
+            version = self._order_books.get_version(pair)
+
+            if self._pairs_versions.get(pair) != version:
+                self._pairs_versions[pair] = version
+                self._dirty_chains.update(chains)
+
+                if self._graph is not None:
+                    self._set_edge(pair)
+
+        dirty_chains = [chain for chain, _ in self._dirty_chains.most_common()]
+        self._dirty_chains.clear()
+        margins = {}
+
+        if self._graph is not None and dirty_chains:
+            dirty_chains, margins = self._graph.screen_chains(dirty_chains)
+            self.evaluations_screened += len(margins)
+
+        self.evaluations_performed += len(dirty_chains)
+        self.evaluations_skipped += len(self._chains) - len(dirty_chains)
+
+        if not dirty_chains and not margins:
+            return
+
+        chains_to_remove = []
+
+        if dirty_chains:
+            chains_to_remove, checked_margins = \
+                await self._check_chains({chain: self._chains[chain] for chain in dirty_chains})
+            margins.update(checked_margins)
+
+        for chain, margin in margins.items():
+            self._scores.update(chain, margin)
+
+        for chain in chains_to_remove:
+            await self.remove_chain(chain)
+
+        self._update_intervals()
+
+    async def run(self, duration, chains_adding=None):
+        """
+        :param duration: secs.
+        :param chains_adding: future which is done when all chains are added, until then
+                              the scheduler waits for chains if it has none.
+        """
+        loop = asyncio.get_event_loop()
+        time_end = loop.time() + duration
+        tick_duration = 0
+
+        while loop.time() < time_end:
+            if not self._chains:
+                if chains_adding is None or chains_adding.done():
+                    break
+
+                try:
+                    await asyncio.wait_for(self._chain_added.wait(), timeout=self._max_idle_time)
+                except asyncio.TimeoutError:
+                    pass
+
+                self._chain_added.clear()
+                continue
+
+            tick_start = loop.time()
+            await self._tick()
+            tick_duration = loop.time() - tick_start
+
+            self._ticks_count += 1
+            self._ticks_duration += tick_duration
+
+            if self._ticks_count % self._report_every == 0:
+                self._report(tick_duration)
+
+        if self._ticks_count:
+            self._report(tick_duration)
+
+    async def close(self):
+        await self._scores.save()
+        await asyncio.gather(
+            *(self.remove_chain(chain) for chain in list(self._chains))
+        )
 
 
 class BitsharesArbitrage(BaseRin):
@@ -31,26 +358,47 @@ class BitsharesArbitrage(BaseRin):
     _bts_default_fee = None
     _blacklisted_assets_file = utils.get_file(BaseRin.work_dir, f'blacklist.lst')
     _is_orders_placing = False
+    _account_id = None
+    _cycle_started_at = 0
+    _first_evaluation_reported = False
     _core_assets = ('BTS', 'CNY', 'USD', 'BRIDGE.BTC')
 
+    _cycle_retry_delay = 1
+    _max_cycle_retry_delay = 300
+
     _client_conn_err_msg = 'Getting client connection error while arbitrage testing.'
 
     def __init__(self, loop):
         self._ioloop = loop
         self._profit_logger = self.setup_logger('Profit', os.path.join(self.log_dir, 'profit.log'))
         self._blacklisted_assets = self.get_blacklisted_assets()
-
-    @staticmethod
-    async def close_connections(*args):
-        await asyncio.gather(
-            *(obj.close() for objs in args for obj in objs)
-        )
+        self._order_books = OrderBookStore()
+        self._chains_scores = ChainsScores()
+        self._scheduler = None
+        self._live_chains = {}
+        self._live_tasks = set()
+        self._signer = Signer(self.active_key) if self.local_signer else None
 
     async def _add_asset_to_blacklist(self, asset):
         if asset not in self._blacklisted_assets:
             self._blacklisted_assets.append(asset)
             await self.write_data(asset, self._blacklisted_assets_file)
 
+    async def _get_restricted_assets(self, chain):
+        """
+        :return: assets of chain which are traded only by authorized accounts.
+        """
+        assets = list(dict.fromkeys(asset for pair in chain for asset in pair.split(':')))
+        ids = [await assets_registry.get_id(asset) for asset in assets]
+        asset_obj = await Asset().connect()
+        objects = await asset_obj.get_objects(*ids)
+        await asset_obj.close()
+
+        return [
+            asset for asset, obj in zip(assets, objects)
+            if obj and (obj['options']['whitelist_authorities'] or obj['options']['blacklist_authorities'])
+        ]
+
     async def _orders_setter(self, orders_placement_data, chain):
         def convert_scientific_notation_to_decimal(val):
             pattern = re.compile(r'e-')
@@ -61,48 +409,51 @@ class BitsharesArbitrage(BaseRin):
 
             return str(val)
 
-        filled_all = True
-        order_objs = await asyncio.gather(
-            *(Order().connect(ws_node=self.wallet_uri) for _ in range(len(chain))),
-        )
+        async def convert_to_amount(val, asset):
+            return int(Decimal(convert_scientific_notation_to_decimal(val)).scaleb(
+                await assets_registry.get_precision(asset)
+            ))
+
+        order_obj = self._signer or await Order().connect(ws_node=self.wallet_uri)
+
+        if self._account_id is None:
+            BitsharesArbitrage._account_id = self.account_id or await order_obj.get_account_id(self.account_name)
+
+        operations = []
 
-        for i, (vols_arr, order_obj) in enumerate(zip(orders_placement_data, order_objs)):
-            splitted_pair = chain[i].split(':')
-            converted_vols_arr = tuple(
-                map(
-                    convert_scientific_notation_to_decimal, vols_arr
+        for pair, vols_arr in zip(chain, orders_placement_data):
+            sell_asset, receive_asset = pair.split(':')
+            operations.append(
+                order_obj.make_limit_order_create(
+                    self._account_id,
+                    await convert_to_amount(vols_arr[0], sell_asset), await assets_registry.get_id(sell_asset),
+                    await convert_to_amount(vols_arr[1], receive_asset), await assets_registry.get_id(receive_asset)
                 )
             )
 
-            try:
-                await order_obj.create_order(
-                    f'{self.account_name}', f'{converted_vols_arr[0]}', f'{splitted_pair[0]}',
-                    f'{converted_vols_arr[1]}', f'{splitted_pair[1]}', 0, True, True
-                )
+        try:
+            await order_obj.create_orders(*operations)
 
-            except OrderNotFilled:
-                filled_all = False
-                self._profit_logger.warning(f'Order for pair {chain[i]} in chain '
-                                            f'{chain} with volumes {vols_arr} not filled.')
-                break
+        except OrderNotFilled:
+            self._profit_logger.warning(f'Orders for chain {chain} with volumes '
+                                        f'{orders_placement_data} not filled.')
+            return False
 
-            except AuthorizedAsset:
-                await self.close_connections(order_objs)
-                await self._add_asset_to_blacklist(splitted_pair[1])
-                self._profit_logger.warning(f'Got Authorized asset {chain[i][1]} '
-                                            f'in chain {chain} while placing order.')
-                raise
+        except AuthorizedAsset:
+            # The node does not tell which order of the transaction failed.
+            for asset in await self._get_restricted_assets(chain):
+                await self._add_asset_to_blacklist(asset)
 
-            except UnknownOrderException:
-                await self.close_connections(order_objs)
-                raise
+            self._profit_logger.warning(f'Got Authorized asset in chain {chain} while placing orders.')
+            raise
 
-        if filled_all:
-            self._profit_logger.info(f'All orders for {chain} with volumes '
-                                     f'- {orders_placement_data} successfully filed.')
-        await self.close_connections(order_objs)
+        finally:
+            await order_obj.close()
 
-        return filled_all
+        self._profit_logger.info(f'All orders for {chain} with volumes '
+                                 f'- {orders_placement_data} successfully filed.')
+
+        return True
 
     async def _volumes_checker(self, orders_vols, chain, profit):
         if orders_vols.size:
@@ -110,47 +461,10 @@ class BitsharesArbitrage(BaseRin):
                 self._profit_logger.info(f'Profit = {profit} | Chain: {chain} | '
                                          f'Volumes: {orders_vols[0][0], orders_vols[2][1]}')
 
-    async def _get_order_data_for_pair(self, pair, market_gram, order_type='asks', limit=BaseRin.orders_depth):
-        base_asset, quote_asset = pair.split(':')
-        raw_orders_data = await market_gram.get_order_book(base_asset, quote_asset, order_type, limit=limit)
-        arr = np.array([
-            *map(
-                lambda order_data: tuple(float(value) for value in order_data.values()), raw_orders_data
-            )
-        ], dtype=self.dtype_float64)
-
-        try:
-            arr[0]
-        except IndexError:
-            raise EmptyOrdersList
-
-        return arr
-
-    async def _get_orders_data_for_chain(self, chain, gram_markets):
-        async def get_size_of_smallest_arr(arrs_lst):
-            return min(map(lambda x: len(x), arrs_lst))
-
-        async def cut_off_extra_arrs_els(arrs_lst, required_nums_of_items):
-            arr = np.array([
-                *map(lambda x: x[:required_nums_of_items], arrs_lst)
-            ], dtype=self.dtype_float64)
-
-            return arr
-
-        pairs_orders_data_arrs = await asyncio.gather(
-            *(self._get_order_data_for_pair(pair, market) for pair, market in zip(chain, gram_markets))
-        )
-
-        try:
-            pairs_orders_data_arr = np.array(pairs_orders_data_arrs, dtype=self.dtype_float64)
-        except ValueError:
-            len_of_smallest_arr = await get_size_of_smallest_arr(pairs_orders_data_arrs)
-            pairs_orders_data_arr = await cut_off_extra_arrs_els(pairs_orders_data_arrs, len_of_smallest_arr)
-
-        return pairs_orders_data_arr
+    async def _get_orders_data_for_chain(self, chain, out=None):
+        return self._order_books.get_orders_data_for_chain(chain, out)
 
     async def _get_precisions_arr(self, chain):
-        obj = await Asset().connect(ws_node=self.wallet_uri)
         assets_arr = itertools.chain.from_iterable(
                 map(lambda x: x.split(':'), chain)
             )
@@ -161,10 +475,7 @@ class BitsharesArbitrage(BaseRin):
                 precisions_arr[i] = (precisions_arr[i - 1])
                 continue
 
-            precisions_arr[i] = (
-                (await obj.get_asset_info(asset))['precision']
-            )
-        await obj.close()
+            precisions_arr[i] = await assets_registry.get_precision(asset)
 
         return np.append(precisions_arr, (precisions_arr[3], precisions_arr[0]))
 
@@ -174,56 +485,409 @@ class BitsharesArbitrage(BaseRin):
             pair.split(':')[0]
         )
 
-    async def _get_specific_data(self, chain):
+    async def _get_specific_data(self, chain, vol_limits=None, bts_default_fee=None):
+        vol_limits = self._vol_limits if vol_limits is None else vol_limits
+        bts_default_fee = self._bts_default_fee if bts_default_fee is None else bts_default_fee
+
         return (
-            np.float_(await self._get_fee_or_limit(self._vol_limits, chain[0])),
-            np.float_(await self._get_fee_or_limit(self._bts_default_fee, chain[0])),
+            np.float_(await self._get_fee_or_limit(vol_limits, chain[0])),
+            np.float_(await self._get_fee_or_limit(bts_default_fee, chain[0])),
             np.float_(await self._get_fee_or_limit(self.min_profit_limits, chain[0])),
             await self._get_precisions_arr(chain)
         )
 
+    async def _wait_for_markets_changes(self, markets_changed, time_left):
+        try:
+            await asyncio.wait_for(markets_changed.wait(), timeout=time_left)
+        except asyncio.TimeoutError:
+            pass
+
+        markets_changed.clear()
+
+    async def _place_orders(self, orders_vols, chain, profit):
+        if self._is_orders_placing is False:
+            self._is_orders_placing = True
+
+            try:
+                await self._volumes_checker(orders_vols, chain, profit)
+            finally:
+                self._is_orders_placing = False
+
+    async def _check_chain(self, chain, assets_fees, specific_data, buffers=None):
+        """
+        :param buffers: AlgorithmBuffers of the chain.
+        :return: margin of chain (profit divided by volume limit), nan if it is unknown
+                 or None if chain must not be checked anymore.
+        """
+        asset_vol_limit, bts_default_fee, min_profit_limit, precisions_arr = specific_data
+        margin = np.nan
+
+        try:
+            orders_arrs = await self._get_orders_data_for_chain(
+                chain, None if buffers is None else buffers.orders_data
+            )
+            orders_vols, profit = ArbitrationAlgorithm(orders_arrs, asset_vol_limit, bts_default_fee,
+                                                       assets_fees, min_profit_limit, precisions_arr).run(
+                buffers, optimal=bool(self.optimal_trade_size)
+            )
+            margin = profit / asset_vol_limit
+            self._report_first_evaluation()
+            await self._place_orders(orders_vols, chain, profit)
+
+        except (EmptyOrdersList, AuthorizedAsset, UnknownOrderException):
+            return None
+
+        except ClientConnectionError:
+            self._logger.warning(f'Connection lost while checking chain {chain}, will check it later.')
+
+        return margin
+
+    async def _check_chains(self, chains):
+        """
+        Checks all chains with a single run of BatchArbitrationAlgorithm.
+
+        :param chains: dict of chains and their (assets_fees, specific_data).
+        :return: tuple of list of chains which must not be checked anymore and dict of margins of chains.
+        """
+        chains_list = list(chains)
+        orders_data, depths = self._order_books.get_orders_data_for_chains(chains_list)
+        assets_fees, specific_data = zip(*chains.values())
+        vol_limits, bts_default_fees, min_profit_limits, precisions_arrs = zip(*specific_data)
+        vol_limits = np.array(vol_limits, dtype=self.dtype_float64)
+
+        orders_vols, profits, is_profitable = BatchArbitrationAlgorithm(
+            orders_data, vol_limits,
+            np.array(bts_default_fees, dtype=self.dtype_float64), np.array(assets_fees, dtype=self.dtype_float64),
+            np.array(min_profit_limits, dtype=self.dtype_float64), np.array(precisions_arrs), depths
+        )()
+        self._report_first_evaluation()
+        chains_to_remove = [chain for chain, depth in zip(chains_list, depths) if depth == 0]
+        margins = {
+            chain: margin for chain, margin, depth in zip(chains_list, (profits / vol_limits).tolist(), depths)
+            if depth > 0
+        }
+
+        profitable_chains = np.flatnonzero(is_profitable & (depths > 0))
+
+        for i in profitable_chains[np.argsort(-profits[profitable_chains], kind='stable')]:
+            chain = chains_list[i]
+
+            try:
+                await self._place_orders(orders_vols[i], chain, profits[i])
+
+            except (AuthorizedAsset, UnknownOrderException):
+                chains_to_remove.append(chain)
+
+            except ClientConnectionError:
+                self._logger.warning(f'Connection lost while placing orders for chain {chain}, '
+                                     f'will check it later.')
+
+        return chains_to_remove, margins
+
+    async def _check_each_chain(self, chains):
+        """
+        Checks chains one by one, used when volumes are searched by the optimizer which is not batched.
+
+        :param chains: dict of chains and their (assets_fees, specific_data).
+        :return: tuple of list of chains which must not be checked anymore and dict of margins of chains.
+        """
+        chains_to_remove = []
+        margins = {}
+
+        for chain, args in chains.items():
+            margin = await self._check_chain(chain, *args)
+
+            if margin is None:
+                chains_to_remove.append(chain)
+            else:
+                margins[chain] = margin
+
+        return chains_to_remove, margins
+
     async def _arbitrage_testing(self, chain, assets_fees):
-        markets_objs = await asyncio.gather(
-            *(Market().connect() for _ in range(len(chain)))
-        )
-        asset_vol_limit, bts_default_fee, min_profit_limit, precisions_arr = await self._get_specific_data(chain)
+        markets_changed = asyncio.Event()
+        await self._order_books.watch(chain, markets_changed)
+        specific_data = await self._get_specific_data(chain)
+        buffers = AlgorithmBuffers(specific_data[3], self.orders_depth)
 
         time_start = dt.now()
         time_delta = 0
 
         while time_delta < self.data_update_time:
-            try:
-                orders_arrs = await self._get_orders_data_for_chain(chain, markets_objs)
-                orders_vols, profit = await ArbitrationAlgorithm(orders_arrs, asset_vol_limit, bts_default_fee,
-                                                                 assets_fees, min_profit_limit, precisions_arr)()
-                if self._is_orders_placing is False:
-                    self._is_orders_placing = True
-                    await self._volumes_checker(orders_vols, chain, profit)
-                    self._is_orders_placing = False
-
-            except (EmptyOrdersList, AuthorizedAsset, UnknownOrderException):
-                await self.close_connections(markets_objs)
-                return
+            if await self._check_chain(chain, assets_fees, specific_data, buffers) is None:
+                break
+
+            time_left = self.data_update_time * 3600 - (dt.now() - time_start).total_seconds()
+            await self._wait_for_markets_changes(markets_changed, max(time_left, 0))
 
             time_end = dt.now()
             time_delta = (time_end - time_start).seconds / 3600
 
-        await self.close_connections(markets_objs)
+        await self._order_books.unwatch(chain, markets_changed)
+
+    async def _add_chain_to_scheduler(self, scheduler, chain, assets_fees):
+        await scheduler.add_chain(chain, assets_fees, await self._get_specific_data(chain))
+
+    async def _load_limits_and_fees(self):
+        self._vol_limits, self._bts_default_fee = await asyncio.gather(
+            VolLimits(self._ioloop).load_volume_limits(),
+            DefaultBTSFee(self._ioloop).load_converted_default_bts_fee()
+        )
+
+    async def _start_chain(self, limits_and_fees, chain_and_fees, scheduler=None):
+        await asyncio.shield(limits_and_fees)
+
+        if scheduler is None:
+            await self._arbitrage_testing(chain_and_fees.chain, chain_and_fees.fees)
+        else:
+            await self._add_chain_to_scheduler(scheduler, chain_and_fees.chain, chain_and_fees.fees)
+
+    async def _start_chains(self, limits_and_fees, scheduler=None):
+        """
+        Starts each chain as soon as it is created and got fees.
+        """
+        tasks = []
+
+        async for chain_and_fees in ChainsWithGatewayPairFees(self._ioloop).iter_chains_with_fees():
+            tasks.append(
+                asyncio.ensure_future(self._start_chain(limits_and_fees, chain_and_fees, scheduler))
+            )
+
+        await asyncio.gather(*tasks)
+
+    def _report_first_evaluation(self):
+        if self._first_evaluation_reported:
+            return
+
+        self._first_evaluation_reported = True
+        self._logger.info(f'First chain evaluated in '
+                          f'{self._ioloop.time() - self._cycle_started_at:.2f}s after start of cycle.')
+
+    async def _run_arbitrage_cycle(self):
+        """
+        Limits and fees are got concurrently with parsing of pairs and creating of chains,
+        chains start trading one by one as soon as their own data is ready.
+        """
+        self._cycle_started_at = self._ioloop.time()
+        self._first_evaluation_reported = False
+        limits_and_fees = asyncio.ensure_future(self._load_limits_and_fees())
+
+        if self.market_subscriptions:
+            await self._start_chains(limits_and_fees)
+            return
+
+        scheduler = PairsTickScheduler(
+            self._order_books, self._check_each_chain if self.optimal_trade_size else self._check_chains,
+            scores=self._chains_scores
+        )
+        chains_adding = asyncio.ensure_future(self._start_chains(limits_and_fees, scheduler))
+
+        try:
+            await scheduler.run(self.data_update_time * 3600, chains_adding)
+
+            if chains_adding.done():
+                chains_adding.result()
+        finally:
+            chains_adding.cancel()
+            await scheduler.close()
+
+    def _read_last_artifacts(self):
+        """
+        :return: tuple of chains with fees, volume limits and default bts fees from the newest valid
+                 artifacts in output dir or None if any of them is missing.
+        """
+        chains_and_fees = ChainsWithGatewayPairFees(self._ioloop).read_last_artifact()
+        vol_limits = VolLimits(self._ioloop).read_last_artifact()
+        bts_default_fee = DefaultBTSFee(self._ioloop).read_last_artifact()
+
+        if chains_and_fees and vol_limits and bts_default_fee:
+            return chains_and_fees, vol_limits, bts_default_fee
+
+    async def _build_artifacts(self):
+        """
+        :return: tuple of chains with fees, volume limits and default bts fees got from scratch.
+        """
+        (vol_limits, bts_default_fee), chains_and_fees = await asyncio.gather(
+            asyncio.gather(
+                VolLimits(self._ioloop).load_volume_limits(),
+                DefaultBTSFee(self._ioloop).load_converted_default_bts_fee()
+            ),
+            ChainsWithGatewayPairFees(self._ioloop).load_chains_with_fees()
+        )
+
+        return chains_and_fees, vol_limits, bts_default_fee
+
+    async def _arbitrage_live_chain(self, chain, markets_changed):
+        """
+        Checks chain on each change of its markets while it is live. Chain data is taken from live chains
+        before each check, so the chain picks up data swapped in by rebuilds.
+
+        :param markets_changed: asyncio.Event of the chain in live chains, the chain stops if it is removed
+                                from live chains or added again with another event.
+        """
+        try:
+            await self._order_books.watch(chain, markets_changed)
+        except ClientConnectionError:
+            self._logger.warning(f'Connection lost while loading order books of chain {chain}, '
+                                 f'it will be added by the next rebuild.')
+            self._live_chains.pop(chain, None)
+            return
+
+        buffers, buffers_data = None, None
+
+        try:
+            while True:
+                live_chain = self._live_chains.get(chain)
+
+                if live_chain is None or live_chain[0] is not markets_changed:
+                    break
+
+                _, assets_fees, specific_data = live_chain
+
+                if specific_data is not buffers_data:
+                    buffers, buffers_data = AlgorithmBuffers(specific_data[3], self.orders_depth), specific_data
+
+                if await self._check_chain(chain, assets_fees, specific_data, buffers) is None:
+                    if self._live_chains.get(chain) is live_chain:
+                        del self._live_chains[chain]
+
+                    break
+
+                await markets_changed.wait()
+                markets_changed.clear()
+
+        finally:
+            await self._order_books.unwatch(chain, markets_changed)
+
+    def _on_live_chain_done(self, task):
+        self._live_tasks.discard(task)
+
+        if not task.cancelled() and task.exception() is not None:
+            self._logger.error('Exception occurred while arbitrage testing.', exc_info=task.exception())
+
+    def _swap_subscribed_chains(self, chains):
+        """
+        :param chains: dict of chains and their (assets_fees, specific_data).
+        :return: tuple of numbers of added and removed chains.
+        """
+        removed_chains = [chain for chain in self._live_chains if chain not in chains]
+        new_chains = [chain for chain in chains if chain not in self._live_chains]
+
+        for chain in removed_chains:
+            self._live_chains.pop(chain)[0].set()
+
+        for chain, (assets_fees, specific_data) in chains.items():
+            markets_changed = self._live_chains[chain][0] if chain in self._live_chains else asyncio.Event()
+            self._live_chains[chain] = (markets_changed, assets_fees, specific_data)
+
+        for chain in new_chains:
+            task = asyncio.ensure_future(self._arbitrage_live_chain(chain, self._live_chains[chain][0]))
+            task.add_done_callback(self._on_live_chain_done)
+            self._live_tasks.add(task)
+
+        return len(new_chains), len(removed_chains)
+
+    async def _swap_live_chains(self, chains_and_fees, vol_limits, bts_default_fee):
+        """
+        Data of all chains is got before the swap, then chains are replaced at once, so no chain
+        is checked with a mix of old and new limits and fees.
+        """
+        specific_data = await asyncio.gather(
+            *(self._get_specific_data(chain_and_fees.chain, vol_limits, bts_default_fee)
+              for chain_and_fees in chains_and_fees)
+        )
+        chains = {
+            chain_and_fees.chain: (chain_and_fees.fees, data)
+            for chain_and_fees, data in zip(chains_and_fees, specific_data)
+        }
+
+        if self._scheduler is None:
+            added_num, removed_num = self._swap_subscribed_chains(chains)
+        else:
+            added_num, removed_num = await self._scheduler.swap_chains(chains)
+
+        self._vol_limits, self._bts_default_fee = vol_limits, bts_default_fee
+        self._logger.info(f'Swapped live chains: {added_num} added, {removed_num} removed, {len(chains)} live.')
+        # Warm start may run for days without clean shutdown, scores would be lost with a crash.
+        await self._chains_scores.save()
+
+    async def _refresh_live_chains(self):
+        artifacts = self._read_last_artifacts()
+
+        if artifacts is None:
+            self._logger.info('No valid artifacts for warm start, building them before trading.')
+            await self._swap_live_chains(*await self._build_artifacts())
+            await asyncio.sleep(self.data_update_time * 3600)
+
+        else:
+            self._logger.info(f'Warm start with {len(artifacts[0])} chains from the last artifacts.')
+            await self._swap_live_chains(*artifacts)
+
+        while True:
+            try:
+                await self._swap_live_chains(*await self._build_artifacts())
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                self._logger.exception('Could not rebuild artifacts, keep trading with the previous chains.')
+
+            await asyncio.sleep(self.data_update_time * 3600)
+
+    async def _stop_live_chains(self):
+        if self._scheduler is not None:
+            await self._scheduler.close()
+            self._scheduler = None
+
+        for markets_changed, *_ in self._live_chains.values():
+            markets_changed.set()
+
+        self._live_chains.clear()
+        await asyncio.gather(*self._live_tasks, return_exceptions=True)
+
+    async def _run_warm(self):
+        """
+        Trading starts with the newest artifacts in output dir while they are rebuilt in background,
+        then live chains are swapped each time rebuild finishes, so neither restarts nor data updates
+        stop trading.
+        """
+        self._cycle_started_at = self._ioloop.time()
+        self._first_evaluation_reported = False
+
+        if not self.market_subscriptions:
+            self._scheduler = PairsTickScheduler(
+                self._order_books, self._check_each_chain if self.optimal_trade_size else self._check_chains,
+                scores=self._chains_scores
+            )
+
+        refreshing = asyncio.ensure_future(self._refresh_live_chains())
+
+        try:
+            if self._scheduler is None:
+                await refreshing
+            else:
+                await self._scheduler.run(math.inf, refreshing)
+                refreshing.result()
+        finally:
+            refreshing.cancel()
+            await self._stop_live_chains()
 
     def start_arbitrage(self):
         cycle_counter = 0
+        failed_cycles = 0
+        run_cycle = self._run_warm if self.warm_start else self._run_arbitrage_cycle
 
         while True:
-            chains = ChainsWithGatewayPairFees(self._ioloop).get_chains_with_fees()
-            self._vol_limits = VolLimits(self._ioloop).get_volume_limits()
-            self._bts_default_fee = DefaultBTSFee(self._ioloop).get_converted_default_bts_fee()
-            tasks = (self._ioloop.create_task(self._arbitrage_testing(chain.chain, chain.fees)) for chain in chains)
-
             try:
-                self._ioloop.run_until_complete(asyncio.gather(*tasks))
+                self._ioloop.run_until_complete(run_cycle())
             except ClientConnectionError:
-                self._logger.exception(self._client_conn_err_msg)
-                time.sleep(self.time_to_reconnect)
+                # Connections already failed to reconnect within time to reconnect, start new cycle
+                # after a delay which grows while cycles keep failing.
+                delay = get_backoff_delay(failed_cycles, self._cycle_retry_delay, self._max_cycle_retry_delay)
+                self._logger.error(f'{self._client_conn_err_msg} Next cycle in {delay:.1f}s.',
+                                   exc_info=failed_cycles == 0)
+                failed_cycles += 1
+                time.sleep(delay)
             else:
                 self._logger.info(f'Success arbitrage cycle #{cycle_counter}.\n')
                 cycle_counter += 1
+                failed_cycles = 0
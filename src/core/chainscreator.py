@@ -1,36 +1,36 @@
 # -*- coding: utf-8 -*-
 import logging
-import asyncio
+
+from collections import defaultdict
 
 from src.extra.baserin import BaseRin
 from src.extra import utils
+from src.extra.artifactwriter import ArtifactWriter
 
+from src.parsers.nodepairsparser import NodePairsParser
 from src.parsers.cryptofreshparser import CryptofreshParser
 from src.parsers.bitsharesexplorerparser import BitsharesExplorerParser
 
-from src.aiopybitshares.asset import Asset
+from .assetsregistry import assets_registry
 
 
 class ChainsCreator(BaseRin):
     _logger = logging.getLogger('Rin.ChainsCreator')
-    _lock = asyncio.Lock()
     _main_assets = ['BTS', 'BRIDGE.BTC', 'CNY', 'USD']
-    _old_file = utils.get_file(BaseRin.output_dir, utils.get_dir_file(BaseRin.output_dir, 'chains'))
-    _date = utils.get_today_date()
-    _new_file = utils.get_file(BaseRin.output_dir, f'chains-{_date}.lst')
     _chains_count = 0
 
     def __init__(self, loop):
         self._ioloop = loop
-        self._blacklisted_assets = self.get_blacklisted_assets()
-        self._file_with_pairs = self._get_file_with_pairs()
+        self._old_file, self._new_file = utils.get_artifact_files(self.output_dir, 'chains')
+        self._blacklisted_assets = set(self.get_blacklisted_assets())
+        self._file_with_chains = None
 
-    def _get_file_with_pairs(self):
-        parsers = [BitsharesExplorerParser, CryptofreshParser]
+    async def _get_file_with_pairs(self):
+        parsers = [NodePairsParser, BitsharesExplorerParser, CryptofreshParser]
         file_with_pairs = []
 
         for parser in parsers:
-            file_data = parser(self._ioloop).start_parsing()
+            file_data = await parser(self._ioloop).parse()
 
             try:
                 if file_data.new_version:
@@ -40,82 +40,111 @@ class ChainsCreator(BaseRin):
 
         return file_with_pairs[0]
 
-    async def _check_chain_on_entry_in_blacklist(self, chain):
-        for asset in chain:
-            if asset in self._blacklisted_assets:
-                return True
-
     @staticmethod
-    async def _get_chain_with_ids(pygram_obj, *args):
-        chains_with_ids = list(args)
+    def get_adjacency_index(pairs):
+        """
+        :param pairs: seq of pairs like 'A:B', pairs repeated in reverse direction are counted once.
+        :return: dict of asset and set of assets which it is traded with.
+        """
+        adjacency = defaultdict(set)
+
+        for pair in pairs:
+            base, quote = pair.split(':')
 
-        for i in range(0, len(args), 2):
-            chains_with_ids[i] = chains_with_ids[i-1] = await pygram_obj.convert_name_to_id(args[i])
+            if base != quote:
+                adjacency[base].add(quote)
+                adjacency[quote].add(base)
 
-        return '{}:{} {}:{} {}:{}'.format(*chains_with_ids), chains_with_ids
+        return adjacency
 
     @staticmethod
-    async def _adjust_asset_location_in_seq(asset, seq):
-        if seq[0] != asset:
-            seq.reverse()
+    def get_triangles(main_asset, adjacency):
+        """
+        Enumerates chains main_asset -> asset -> asset2 -> main_asset in O(sum of squared degrees).
 
-        return seq
+        :return: generator of (main_asset, asset, asset2) tuples.
+        """
+        neighbours = adjacency.get(main_asset, ())
 
-    async def _create_chains_for_asset(self, main_asset, pairs):
-        chains = []
-        pygram_asset = Asset()
-        await pygram_asset.connect()
+        for asset in sorted(neighbours):
+            for asset2 in sorted(adjacency[asset]):
+                if asset2 != main_asset and asset2 in neighbours:
+                    yield main_asset, asset, asset2
 
-        for pair in pairs:
-            if main_asset in pair:
-                main = (await self._adjust_asset_location_in_seq(main_asset, pair)).copy()
-
-                for pair2 in pairs:
-                    if main[1] in pair2 and main_asset not in pair2:
-                        secondary = (await self._adjust_asset_location_in_seq(main[1], pair2)).copy()
+    @staticmethod
+    async def _get_assets_ids(assets):
+        ids = {}
 
-                        for pair3 in pairs:
-                            if secondary[1] in pair3 and main_asset in pair3:
-                                tertiary = (await self._adjust_asset_location_in_seq(secondary[1], pair3)).copy()
-                                chain = await self._get_chain_with_ids(pygram_asset, *main, *secondary, *tertiary)
+        for asset in assets:
+            try:
+                ids[asset] = await assets_registry.get_id(asset)
+            except Exception:
+                pass
 
-                                if chain[0] not in chains:
-                                    chains.append(chain[0])
-                                    self._chains_count += 1
+        return ids
 
-                                    if not await self._check_chain_on_entry_in_blacklist(chain[1]):
-                                        await self.write_data(chain[0], self._new_file, lock=self._lock)
+    def _create_chains_for_asset(self, main_asset, adjacency, ids):
+        chains = []
 
-        await pygram_asset.close()
+        for triangle in self.get_triangles(main_asset, adjacency):
+            try:
+                main, asset, asset2 = (ids[el] for el in triangle)
+            except KeyError:
+                continue
 
-    @staticmethod
-    def _remove_pairs_duplicates_from_seq(seq):
-        new_seq = list(map(lambda x: x.split(':'), seq))
+            self._chains_count += 1
 
-        for el in new_seq:
-            el.reverse()
+            if not self._blacklisted_assets.intersection((main, asset, asset2)):
+                chains.append(f'{main}:{asset} {asset}:{asset2} {asset2}:{main}')
 
-            if el in new_seq:
-                index = new_seq.index(el)
-                del new_seq[index]
+        return chains
 
-        return new_seq
+    async def iter_chains(self):
+        """
+        Chains are yielded and written to the chains file as soon as they are created for each main asset.
+        If chains could not be created, chains from the previous chains file are yielded.
 
-    def start_creating_chains(self):
+        :return: async generator of chains, each chain is list of 3 pairs of assets ids.
+        """
         try:
-            pairs_lst = self._remove_pairs_duplicates_from_seq(
-                self.get_data_from_file(self._file_with_pairs)
+            adjacency = self.get_adjacency_index(
+                self.get_data_from_file(await self._get_file_with_pairs())
             )
-            tasks = [self._ioloop.create_task(self._create_chains_for_asset(asset, pairs_lst))
-                     for asset in self._main_assets]
-            self._ioloop.run_until_complete(asyncio.wait(tasks))
+            await assets_registry.load_symbols(adjacency)
+            ids = await self._get_assets_ids(adjacency)
 
         except Exception as err:
             self._logger.exception('Exception occurred while creating chains.', err)
-            return self.actions_when_error(self._old_file)
+            self._file_with_chains = self.actions_when_error(self._old_file)
+
+            if self._file_with_chains:
+                for chain in self.get_transformed_data(self._file_with_chains, generator=True):
+                    yield chain
+
+            return
+
+        self._logger.info(f'Got ids of {len(ids)} of {len(adjacency)} assets.')
+
+        # If iteration is stopped before the end, the new chains file is discarded.
+        async with ArtifactWriter(self._new_file) as writer:
+            for asset in self._main_assets:
+                chains = self._create_chains_for_asset(asset, adjacency, ids)
 
-        else:
-            utils.remove_file(self._old_file)
-            self._logger.info(f'Created: {self._chains_count} chains.')
+                if chains:
+                    await writer.write('\n'.join(chains))
 
-            return self._new_file
+                for chain in chains:
+                    yield chain.split(' ')
+
+        utils.remove_file(self._old_file)
+        self._file_with_chains = self._new_file
+        self._logger.info(f'Created: {self._chains_count} chains.')
+
+    async def _create_chains(self):
+        async for _ in self.iter_chains():
+            pass
+
+        return self._file_with_chains
+
+    def start_creating_chains(self):
+        return self._ioloop.run_until_complete(self._create_chains())
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+import math
+import logging
+
+import ujson
+
+from src.extra.baserin import BaseRin
+from src.extra import utils
+from src.extra.artifactwriter import ArtifactWriter
+
+
+class ChainsScores(BaseRin):
+    """
+    Score of each chain is exponentially weighted moving average of its margin, which is profit of
+    the chain divided by volume limit of its first asset. Chains which come close to be profitable
+    have scores close to zero or above, dead chains have negative scores.
+
+    Scores are saved to the output dir, so they survive between arbitrage cycles and restarts.
+    In warm start they are also saved each time live chains are swapped.
+    """
+    _logger = logging.getLogger('Rin.ChainsScores')
+    _cache_file = utils.get_file(BaseRin.output_dir, 'chains_scores.json')
+    _alpha = 0.2
+    _min_margin = -1
+    # Weight of chain is e times less for each 1% of margin it is away from profit.
+    _margin_scale = 0.01
+
+    def __init__(self):
+        self._scores = {}
+        self._read_cache()
+
+    @staticmethod
+    def _get_key(chain):
+        return ' '.join(chain)
+
+    def _read_cache(self):
+        try:
+            with open(self._cache_file, 'r') as f:
+                self._scores = ujson.load(f)
+        except (FileNotFoundError, ValueError):
+            pass
+
+    async def save(self):
+        """
+        Scores are written to a temporary file which then replaces the cache file, so a crash
+        while saving does not lose scores saved before.
+        """
+        try:
+            async with ArtifactWriter(self._cache_file) as writer:
+                await writer.write(ujson.dumps(self._scores))
+        except OSError:
+            self._logger.exception('Could not save chains scores.')
+
+    def get_score(self, chain):
+        """
+        :return: score of chain, 0 for chains which were never checked so they are polled often until
+                 their real score is known.
+        """
+        return self._scores.get(self._get_key(chain), 0.)
+
+    def get_weight(self, chain):
+        return math.exp(min(self.get_score(chain), 0) / self._margin_scale)
+
+    def update(self, chain, margin):
+        if math.isnan(margin):
+            return
+
+        key = self._get_key(chain)
+        margin = max(margin, self._min_margin)
+        score = self._scores.get(key)
+
+        self._scores[key] = margin if score is None else score + self._alpha * (margin - score)
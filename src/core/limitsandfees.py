@@ -12,24 +12,23 @@ from collections import namedtuple
 from aiohttp.client_exceptions import ClientConnectionError
 
 from .chainscreator import ChainsCreator
+from .assetsregistry import assets_registry
 from src.extra.baserin import BaseRin
 from src.extra import utils
+from src.extra.artifactwriter import ArtifactWriter
 
-from src.aiopybitshares.asset import Asset
 from src.aiopybitshares.blockchain import Blockchain
 
 
 class VolLimits(BaseRin):
-    _lock = asyncio.Lock()
     _logger = logging.getLogger('Rin.VolLimits')
     _url = 'http://185.208.208.184:5000/get_ticker?base={}&quote={}'
-    _old_file = utils.get_file(BaseRin.output_dir, utils.get_dir_file(BaseRin.output_dir, 'vol_limits'))
-    _date = utils.get_today_date()
-    _new_file = utils.get_file(BaseRin.output_dir, f'vol_limits-{_date}.lst')
+    _artifact_name = 'vol_limits'
     _vol_limits_pattern = None
 
     def __init__(self, loop):
         self._ioloop = loop
+        self._old_file, self._new_file = utils.get_artifact_files(self.output_dir, self._artifact_name)
 
     async def _calculate_limits(self, prices):
         limits = {}
@@ -45,8 +44,7 @@ class VolLimits(BaseRin):
         return limits
 
     async def _get_asset_price(self, base_asset, quote_asset):
-        response = await self.get_data(self._url.format(base_asset, quote_asset),
-                                       logger=None, delay=1, json=True)
+        response = await self.get_data(self._url.format(base_asset, quote_asset), logger=self._logger, json=True)
 
         try:
             return response['latest']
@@ -62,15 +60,14 @@ class VolLimits(BaseRin):
         vol_limits = await self._calculate_limits(prices)
         self._vol_limits_pattern = '{}:{} {}:{} {}:{} {}:{}'\
             .format(*itertools.chain(*vol_limits.items()))
-        await self.write_data(ujson.dumps(vol_limits), self._new_file, self._lock)
+        async with ArtifactWriter(self._new_file) as writer:
+            await writer.write(ujson.dumps(vol_limits))
 
         return vol_limits
 
-    def get_volume_limits(self):
-        tasks = [self._ioloop.create_task(self._get_limits())]
-
+    async def load_volume_limits(self):
         try:
-            vol_limits = self._ioloop.run_until_complete(asyncio.gather(*tasks))[0]
+            vol_limits = await self._get_limits()
         except ClientConnectionError:
             self._logger.exception('Client connection error occurred while getting volume limits.')
             return ujson.loads(
@@ -83,13 +80,29 @@ class VolLimits(BaseRin):
 
             return vol_limits
 
+    def get_volume_limits(self):
+        return self._ioloop.run_until_complete(self.load_volume_limits())
+
+    def read_last_artifact(self):
+        """
+        :return: dict of the newest file in output dir which has values for all assets
+                 from volume limits or None.
+        """
+        for file in utils.get_dir_files_by_age(self.output_dir, self._artifact_name):
+            try:
+                data = ujson.loads(utils.read_file(utils.get_file(self.output_dir, file))[0])
+            except (OSError, IndexError, ValueError):
+                data = None
+
+            if isinstance(data, dict) and all(asset in data for asset in self.volume_limits):
+                return data
+
+            self._logger.warning(f'Skipped invalid file {file}.')
+
 
 class DefaultBTSFee(VolLimits):
     _logger = logging.getLogger('Rin.DefaultBTSFee')
-    _lock = asyncio.Lock()
-    _old_file = utils.get_file(VolLimits.output_dir, utils.get_dir_file(VolLimits.output_dir, 'btsdefaultfee'))
-    _date = utils.get_today_date()
-    _new_file = utils.get_file(VolLimits.output_dir, f'btsdefaultfee-{_date}.lst')
+    _artifact_name = 'btsdefaultfee'
     _lifetime_member_percent = 0.2
     _fees = None
 
@@ -121,15 +134,14 @@ class DefaultBTSFee(VolLimits):
 
         self._fees = '{}:{} {}:{} {}:{} {}:{}' \
             .format(*itertools.chain(*final_fees.items()))
-        await self.write_data(ujson.dumps(final_fees), self._new_file, self._lock)
+        async with ArtifactWriter(self._new_file) as writer:
+            await writer.write(ujson.dumps(final_fees))
 
         return final_fees
 
-    def get_converted_default_bts_fee(self):
-        tasks = [self._ioloop.create_task(self._get_converted_order_fee())]
-
+    async def load_converted_default_bts_fee(self):
         try:
-            converted_fees = self._ioloop.run_until_complete(asyncio.gather(*tasks))[0]
+            converted_fees = await self._get_converted_order_fee()
         except ClientConnectionError:
             self._logger.exception('Client connection error occurred while getting converted default bts fee')
             return ujson.loads(
@@ -142,33 +154,26 @@ class DefaultBTSFee(VolLimits):
 
             return converted_fees
 
+    def get_converted_default_bts_fee(self):
+        return self._ioloop.run_until_complete(self.load_converted_default_bts_fee())
+
 
 class ChainsWithGatewayPairFees(BaseRin):
     _url = 'https://wallet.bitshares.org/#/market/{}_{}'
     _logger = logging.getLogger('Rin.ChainsWithGatewayPairFees')
-    _lock = asyncio.Lock()
-    _old_file = utils.get_file(BaseRin.output_dir, utils.get_dir_file(BaseRin.output_dir, 'chains_with_fees'))
-    _date = utils.get_today_date()
-    _new_file = utils.get_file(BaseRin.output_dir, f'chains_with_fees-{_date}.lst')
+    _artifact_name = 'chains_with_fees'
 
     def __init__(self, loop):
         self._ioloop = loop
-        self._file_with_chains = ChainsCreator(self._ioloop).start_creating_chains()
+        self._old_file, self._new_file = utils.get_artifact_files(self.output_dir, self._artifact_name)
+        self._writer = ArtifactWriter(self._new_file)
         self._fees_count = 0
 
     async def _get_fees_for_chain(self, chain):
-        assets_objs = [Asset() for _ in range(len(chain))]
-        [await asset_obj.connect(self.wallet_uri) for asset_obj in assets_objs]
-
-        raw_chain_fees = await asyncio.gather(
-            *(obj.get_asset_info(pair.split(':')[1]) for obj, pair in zip(assets_objs, chain))
+        fees = await asyncio.gather(
+            *(assets_registry.get_market_fee_percent(pair.split(':')[1]) for pair in chain)
         )
-        [await asset_obj.close() for asset_obj in assets_objs]
-
-        arr = np.array([
-            *(float(fee['options']['market_fee_percent']) / float(100)
-              for fee in raw_chain_fees)
-        ], dtype=self.dtype_float64)
+        arr = np.array(fees, dtype=self.dtype_float64)
 
         return arr
 
@@ -176,7 +181,7 @@ class ChainsWithGatewayPairFees(BaseRin):
         fees = await self._get_fees_for_chain(chain)
 
         data = '{} {} {} {} {} {}'.format(*itertools.chain(chain, fees))
-        await self.write_data(data, self._new_file, self._lock)
+        await self._writer.write(data)
         self._fees_count += 3
 
         ChainAndFees = namedtuple('ChainAndFees', ['chain', 'fees'])
@@ -191,22 +196,72 @@ class ChainsWithGatewayPairFees(BaseRin):
 
             yield ChainAndFees(tuple(itertools.islice(el, 0, 3)), arr)
 
-    def get_chains_with_fees(self):
-        chains = self.get_transformed_data(self._file_with_chains)
-        chains_num = len(chains)
-        tasks = [self._ioloop.create_task(self._get_chain_fees(chain)) for chain in chains]
+    async def iter_chains_with_fees(self):
+        """
+        Fees of each chain are got as soon as the chain is created. If fees could not be got,
+        remaining chains with fees are taken from the previous file.
+
+        :return: async generator of ChainAndFees.
+        """
+        chains_num = 0
+        chains = set()
 
         try:
-            chains_and_fees = self._ioloop.run_until_complete(asyncio.gather(*tasks))
-        except ClientConnectionError:
-            self._logger.error('Client connection error occurred while getting chain fees.')
+            async for chain in ChainsCreator(self._ioloop).iter_chains():
+                try:
+                    chain_and_fees = await self._get_chain_fees(chain)
+                except ClientConnectionError:
+                    self._logger.error('Client connection error occurred while getting chain fees.')
+                    break
 
-            return self._final_data_preparation(
-                        self.get_transformed_data(self._old_file, generator=True)
-                    )
+                chains.add(chain_and_fees.chain)
+                chains_num += 1
 
-        else:
-            utils.remove_file(self._old_file)
-            self._logger.info(f'Successfully got {self._fees_count} fees for {chains_num} chains.')
+                yield chain_and_fees
+
+            else:
+                await self._writer.commit()
+                utils.remove_file(self._old_file)
+                self._logger.info(f'Successfully got {self._fees_count} fees for {chains_num} chains.')
+
+                return
+
+        finally:
+            # Incomplete file is never left, so the previous file stays the last valid one.
+            await self._writer.discard()
+
+        old_chains_and_fees = self._final_data_preparation(
+            self.get_transformed_data(self._old_file, generator=True)
+        )
 
-            return chains_and_fees
+        for chain_and_fees in old_chains_and_fees:
+            if chain_and_fees.chain not in chains:
+                yield chain_and_fees
+
+    def read_last_artifact(self):
+        """
+        Files left by interrupted rebuilds may miss a part of a line, such files are skipped.
+
+        :return: list of ChainAndFees from the newest valid file in output dir or None.
+        """
+        for file in utils.get_dir_files_by_age(self.output_dir, self._artifact_name):
+            try:
+                chains_and_fees = list(self._final_data_preparation(
+                    self.get_transformed_data(utils.get_file(self.output_dir, file), generator=True)
+                ))
+            except (OSError, ValueError):
+                chains_and_fees = None
+
+            if chains_and_fees and all(
+                    len(chain_and_fees.chain) == 3 and len(chain_and_fees.fees) == 3
+                    for chain_and_fees in chains_and_fees
+            ):
+                return chains_and_fees
+
+            self._logger.warning(f'Skipped invalid file {file}.')
+
+    async def load_chains_with_fees(self):
+        return [chain_and_fees async for chain_and_fees in self.iter_chains_with_fees()]
+
+    def get_chains_with_fees(self):
+        return self._ioloop.run_until_complete(self.load_chains_with_fees())
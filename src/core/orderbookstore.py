@@ -0,0 +1,216 @@
+# -*- coding: utf-8 -*-
+import logging
+import asyncio
+
+import numpy as np
+
+from collections import defaultdict
+
+from src.extra.baserin import BaseRin
+from src.extra.customexceptions import EmptyOrdersList
+
+from src.aiopybitshares.market import Market, OrderBookDecoder
+
+
+class OrderBookStore(BaseRin):
+    """
+    In-memory mirror of order books shared by all chains.
+
+    Each pair has a preallocated (depth, 3) buffer of (price, quote, base) rows sorted by price,
+    a decoder with its own buffer for incoming frames and a version counter. A book is re-read
+    once per market notification (or refresh() call) no matter how many chains contain the pair,
+    diffed against the buffer and, if it really changed, its version is bumped and chains
+    watching the pair are woken up.
+    """
+    _logger = logging.getLogger('Rin.OrderBookStore')
+
+    def __init__(self, depth=BaseRin.orders_depth, order_type='asks'):
+        self._depth = depth
+        self._order_type = order_type
+        self._market = Market()
+        self._books = {}
+        self._decoders = {}
+        self._sizes = {}
+        self._versions = defaultdict(int)
+        self._listeners = defaultdict(set)
+        self._refreshing = {}
+        self._stale = set()
+
+    def get_version(self, pair):
+        return self._versions[pair]
+
+    def get_book(self, pair):
+        """
+        :return: read-only view of (price, quote, base) rows of the pair book.
+        """
+        try:
+            return self._books[pair][:self._sizes[pair]]
+        except KeyError:
+            raise EmptyOrdersList
+
+    def _update_book(self, pair, arr):
+        size = len(arr)
+        book = self._books.get(pair)
+
+        if book is None:
+            book = self._books[pair] = np.zeros((self._depth, 3), dtype=self.dtype_float64)
+            book.flags.writeable = False
+
+        elif size == self._sizes[pair] and np.array_equal(book[:size], arr):
+            return False
+
+        book.flags.writeable = True
+        book[:size] = arr
+        book.flags.writeable = False
+        self._sizes[pair] = size
+        self._versions[pair] += 1
+
+        return True
+
+    async def _fetch_and_update_book(self, pair):
+        base_asset, quote_asset = pair.split(':')
+        decoder = self._decoders.get(pair)
+
+        if decoder is None:
+            decoder = self._decoders[pair] = OrderBookDecoder(self._depth, self._order_type)
+
+        while True:
+            self._stale.discard(pair)
+            size = await self._market.decode_order_book(base_asset, quote_asset, decoder)
+
+            # Pair was unwatched while its book was read.
+            if pair not in self._listeners:
+                break
+
+            if self._update_book(pair, decoder.buffer[:size]):
+                for markets_changed in self._listeners.get(pair, ()):
+                    markets_changed.set()
+
+            if pair not in self._stale:
+                break
+
+    async def refresh(self, pair):
+        """
+        Concurrent refreshes of the same pair share a single request. If the market changes
+        while the request is in flight, the book is re-read once more.
+        """
+        future = self._refreshing.get(pair)
+
+        if future is None:
+            future = self._refreshing[pair] = asyncio.ensure_future(self._fetch_and_update_book(pair))
+            future.add_done_callback(lambda _: self._refreshing.pop(pair, None))
+
+        else:
+            self._stale.add(pair)
+
+        await asyncio.shield(future)
+
+    async def refresh_chain(self, chain):
+        await asyncio.gather(
+            *(self.refresh(pair) for pair in chain)
+        )
+
+    async def _refresh_on_notice(self, pair):
+        try:
+            await self.refresh(pair)
+        except Exception:
+            self._logger.exception(f'Error while refreshing order book for {pair}.')
+
+    def _on_market_notice(self, pair):
+        asyncio.ensure_future(self._refresh_on_notice(pair))
+
+    async def _remove_listener(self, pairs, markets_changed):
+        """
+        Books of pairs left without listeners are dropped and their markets are unsubscribed.
+        """
+        for pair in pairs:
+            listeners = self._listeners.get(pair)
+
+            if listeners is None:
+                continue
+
+            listeners.discard(markets_changed)
+
+            if listeners:
+                continue
+
+            del self._listeners[pair]
+            self._books.pop(pair, None)
+            self._decoders.pop(pair, None)
+            self._sizes.pop(pair, None)
+
+            if self.market_subscriptions:
+                await self._market.unsubscribe_from_market(*pair.split(':'))
+
+    async def watch(self, chain, markets_changed):
+        """
+        If subscription or loading of books fails, listeners and subscriptions made by this call
+        are removed before the error is raised.
+        :param chain: seq of pairs.
+        :param markets_changed: asyncio.Event which will be set each time when any pair of chain changes.
+        """
+        new_pairs = [pair for pair in chain if not self._listeners.get(pair)]
+        added_pairs = [pair for pair in chain if markets_changed not in self._listeners.get(pair, ())]
+
+        for pair in added_pairs:
+            self._listeners[pair].add(markets_changed)
+
+        try:
+            if self.market_subscriptions:
+                results = await asyncio.gather(
+                    *(self._market.subscribe_to_market(*pair.split(':'),
+                                                       lambda _, pair=pair: self._on_market_notice(pair))
+                      for pair in new_pairs),
+                    return_exceptions=True
+                )
+
+                for result in results:
+                    if isinstance(result, BaseException):
+                        raise result
+
+            await self.refresh_chain([pair for pair in chain if pair not in self._books])
+
+        except BaseException:
+            await self._remove_listener(added_pairs, markets_changed)
+            raise
+
+    async def unwatch(self, chain, markets_changed):
+        await self._remove_listener(chain, markets_changed)
+
+    def get_orders_data_for_chain(self, chain, out=None):
+        """
+        :param out: 3D array (3, depth, 3) to which books will be copied instead of a new array.
+        :return: 3D array of books of chain pairs cut to the smallest book.
+        """
+        books = [self.get_book(pair) for pair in chain]
+        size = min(map(len, books))
+
+        if size == 0:
+            raise EmptyOrdersList
+
+        if out is None:
+            return np.stack([book[:size] for book in books])
+
+        for i, book in enumerate(books):
+            out[i, :size] = book[:size]
+
+        return out[:, :size]
+
+    def get_orders_data_for_chains(self, chains):
+        """
+        :return: 4D array (chains, 3, depth, 3) of books of chains pairs, each chain cut to its smallest book,
+                 and 1D array of numbers of orders of each chain, which is 0 for chains with an empty book.
+        """
+        orders_data = np.zeros((len(chains), 3, self._depth, 3), dtype=self.dtype_float64)
+        depths = np.zeros(len(chains), dtype=self.dtype_int64)
+
+        for i, chain in enumerate(chains):
+            size = depths[i] = min(self._sizes.get(pair, 0) for pair in chain)
+
+            if size == 0:
+                continue
+
+            for j, pair in enumerate(chain):
+                orders_data[i, j, :size] = self._books[pair][:size]
+
+        return orders_data, depths
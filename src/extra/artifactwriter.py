@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+import os
+import asyncio
+import aiofiles
+
+from . import utils
+
+
+class ArtifactWriter:
+    """
+    Writes records of an output file through an in-memory buffer, which is appended to a temporary
+    file when it grows above _flush_size or _flush_interval secs after the first buffered record.
+    On commit the temporary file is atomically renamed to the output file, so readers never see
+    half-written artifacts. Temporary file is hidden, so it is not matched as an artifact.
+
+    Used as async context manager it is committed on exit or discarded if exception was raised.
+    """
+    _flush_size = 1 << 16
+    _flush_interval = 1
+
+    def __init__(self, file):
+        dir_, name = os.path.split(file)
+        self.file = file
+        self._tmp_file = os.path.join(dir_, f'.{name}.tmp')
+        self._lock = asyncio.Lock()
+        self._buffer = []
+        self._buffer_size = 0
+        self._timer = None
+        self._flusher = None
+        self._is_tmp_file_created = False
+        self._is_finished = False
+        self.records_count = 0
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            await self.commit()
+        else:
+            await self.discard()
+
+    def _cancel_timer(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    def _on_timer(self):
+        self._timer = None
+        self._flusher = asyncio.ensure_future(self.flush())
+
+    async def write(self, data):
+        """
+        :param data: record, it is written as a line.
+        """
+        record = f'{data}\n'
+        self._buffer.append(record)
+        self._buffer_size += len(record)
+        self.records_count += 1
+
+        if self._buffer_size >= self._flush_size:
+            await self.flush()
+
+        elif self._timer is None:
+            self._timer = asyncio.get_event_loop().call_later(self._flush_interval, self._on_timer)
+
+    async def flush(self):
+        async with self._lock:
+            self._cancel_timer()
+
+            # Flush scheduled by the timer may run after commit or discard.
+            if self._is_finished or (not self._buffer and self._is_tmp_file_created):
+                return
+
+            chunk = ''.join(self._buffer)
+            self._buffer.clear()
+            self._buffer_size = 0
+
+            async with aiofiles.open(self._tmp_file, 'a' if self._is_tmp_file_created else 'w') as f:
+                await f.write(chunk)
+
+            self._is_tmp_file_created = True
+
+    async def commit(self):
+        """
+        Flushes buffer and replaces the output file by the written one.
+        """
+        if self._flusher is not None:
+            await self._flusher
+
+        await self.flush()
+
+        async with self._lock:
+            os.replace(self._tmp_file, self.file)
+            self._is_tmp_file_created = False
+            self._is_finished = True
+
+    async def discard(self):
+        self._is_finished = True
+        self._cancel_timer()
+
+        # Flush in progress is waited for, since its write can not be cancelled and would create the
+        # temporary file again, one which has not started yet does nothing.
+        if self._flusher is not None:
+            await asyncio.wait({self._flusher})
+
+        async with self._lock:
+            self._buffer.clear()
+            self._buffer_size = 0
+            utils.remove_file(self._tmp_file)
+            self._is_tmp_file_created = False
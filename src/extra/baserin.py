@@ -1,13 +1,12 @@
 # -*- coding: utf-8 -*-
-import random
 import logging
-import asyncio
-import aiohttp
 import aiofiles
 import numpy as np
 
 from . import utils
 from .configcreator import ConfigCreator
+from .httpclient import HttpClient
+from .httpcache import HttpCache
 from src.blacklistedassets import blacklisted_assets_lst
 
 
@@ -24,20 +23,41 @@ class BaseRin:
     min_profit_limits = cfg_data.get('min profit limits')
 
     node_uri = cfg_data.get('node uri')
+    node_uris = [uri.strip() for uri in node_uri.split(',') if uri.strip()]
     wallet_uri = cfg_data.get('wallet uri')
     explorer_uri = cfg_data.get('explorer uri')
 
     account_name = cfg_data.get('account name')
     account_id = cfg_data.get('account id')
     wallet_pwd = cfg_data.get('wallet password')
+    active_key = cfg_data.get('active key')
 
     data_update_time = cfg_data.get('data update time')
     time_to_reconnect = cfg_data.get('time to reconnect')
     orders_depth = cfg_data.get('orders depth')
+    pool_size = cfg_data.get('pool size')
+    pool_idle_timeout = cfg_data.get('pool idle timeout')
+    market_subscriptions = cfg_data.get('market subscriptions')
+    requests_concurrency = cfg_data.get('requests concurrency')
+    requests_per_second = cfg_data.get('requests per second')
+    assets_cache_ttl = cfg_data.get('assets cache ttl')
+    hedge_requests = cfg_data.get('hedge requests')
+    optimal_trade_size = cfg_data.get('optimal trade size')
+    screen_chains = cfg_data.get('screen chains')
+    warm_start = cfg_data.get('warm start')
+    host_concurrency = cfg_data.get('host concurrency')
+    host_requests_per_second = cfg_data.get('host requests per second')
+    http_cache = cfg_data.get('http cache')
+    local_signer = cfg_data.get('local signer')
 
     dtype_float64 = np.float_
     dtype_int64 = np.int_
 
+    http_client = HttpClient(
+        host_concurrency, host_requests_per_second,
+        HttpCache(utils.get_file(output_dir, 'http_cache')) if http_cache else None
+    )
+
     work_dir = utils.get_dir('rin-bot')
     blacklist = utils.create_empty_file(
         work_dir, 'blacklist.lst'
@@ -68,25 +88,9 @@ class BaseRin:
             if lock:
                 lock.release()
 
-    @staticmethod
-    async def get_data(url, delay, logger, json=False):
-        await asyncio.sleep(random.randint(0, delay))
-        timeout = aiohttp.ClientTimeout(total=30)
-
-        async with aiohttp.ClientSession(timeout=timeout) as session:
-            try:
-                async with session.get(url) as resp:
-                    if resp.status == 200:
-                        if json:
-                            return await resp.json()
-
-                        return await resp.text('utf-8')
-
-            except aiohttp.ClientConnectionError:
-                logger.exception('Error while getting data.')
-
-            except aiohttp.ServerTimeoutError:
-                logger.exception('Error while getting data.')
+    @classmethod
+    async def get_data(cls, url, logger=None, json=False):
+        return await cls.http_client.get(url, json=json, logger=logger)
 
     @staticmethod
     def actions_when_error(retrieve_file=None, value_from_file=False):
@@ -11,6 +11,9 @@ class ConfigCreator:
     _work_dir = utils.get_dir('rin-bot')
     _cfg_file = os.path.join(_work_dir, 'config.ini')
 
+    # Options which may be left empty.
+    _optional_options = ('active key',)
+
     _data = (
         {'DIRS': {
             'output dir': utils.dir_exists(
@@ -30,7 +33,7 @@ class ConfigCreator:
                                              '1.3.1570': 0.000_000_02, '1.3.121': 0.02})
         }},
         {'URI': {
-            'node uri': '',
+            'node uri': '',                 # one or more comma separated uris
             'wallet uri': '',
             'explorer uri': '',
         }},
@@ -38,11 +41,26 @@ class ConfigCreator:
             'account name': '',
             'account id': '',
             'wallet password': '',
+            'active key': '',               # WIF, only for local signer
         }},
         {'OTHER': {
             'data update time': '1',        # hours / required int
-            'time to reconnect': '350',     # secs / required int
-            'orders depth': '5'             # required int
+            'time to reconnect': '350',     # max secs to reconnect / required int
+            'orders depth': '5',            # required int
+            'pool size': '4',               # connections per node or wallet uri / required int
+            'pool idle timeout': '300',     # secs / required int
+            'market subscriptions': '1',    # 1 - evaluate chains on market notifications, 0 - poll / required int
+            'requests concurrency': '50',   # max order books fetched at once while polling / required int
+            'requests per second': '20',    # order books requests budget while polling, 0 - no limit / required int
+            'assets cache ttl': '24',       # hours / required int
+            'hedge requests': '1',          # 1 - duplicate slow order book reads to the second best node
+            'optimal trade size': '0',      # 1 - search the most profitable volume over whole books, 0 - greedy
+            'screen chains': '1',           # 1 - check only chains profitable at best prices by market graph
+            'warm start': '1',              # 1 - trade with the last artifacts while they are rebuilt, 0 - rebuild first
+            'host concurrency': '8',        # max http requests in flight to each host / required int
+            'host requests per second': '10',   # max http requests to each host per second, 0 - no limit
+            'http cache': '1',              # 1 - cache explorer, cryptofresh and price responses in output dir
+            'local signer': '0',            # 1 - sign orders by active key and broadcast them to node, 0 - by wallet
         }}
     )
 
@@ -52,8 +70,8 @@ class ConfigCreator:
         for el in self._data:
             section, options = tuple(*el.items())
 
-            for option in options.keys():
-                if config.get(section, option) == '':
+            for option, value in options.items():
+                if option not in self._optional_options and config.get(section, option, fallback=value) == '':
                     return True
 
     def _create_config(self, config):
@@ -80,15 +98,18 @@ class ConfigCreator:
         for el in self._data:
             section, options = tuple(*el.items())
 
-            for option in options.keys():
+            for option, default in options.items():
+                # Options added in newer versions fall back to defaults for old configs.
+                raw_val = config.get(section, option, fallback=default)
+
                 if section == 'MIN_DAILY_VOLUME' or section == 'OTHER':
-                    val = int(config.get(section, option))
+                    val = int(raw_val)
 
                 elif section == 'LIMITS':
-                    val = ujson.loads(config.get(section, option))
+                    val = ujson.loads(raw_val)
 
                 else:
-                    val = config.get(section, option)
+                    val = raw_val
 
                 data.update(
                     {option: val}
@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+import os
+import time
+import zlib
+import hashlib
+import logging
+
+import ujson
+import aiofiles
+
+from collections import Counter
+
+from . import utils
+
+
+class HttpCache:
+    """
+    On-disk cache of http responses keyed by URL.
+
+    Entry is fresh for TTL of its endpoint and is returned without request. During the next TTL it
+    is stale: it is returned at once and revalidated in background. Older entries are revalidated
+    before they are returned. Revalidation is a conditional request with ETag and Last-Modified of
+    the entry, so unchanged responses come back as empty 304. If the source is down, the entry is
+    returned whatever its age.
+
+    Entries of prices are never returned after TTL, neither stale nor when the source is down.
+
+    Each entry is a zlib compressed json file in the cache dir.
+    """
+    _logger = logging.getLogger('Rin.HttpCache')
+    _report_every = 1000
+    # Secs, first matched substring of URL wins.
+    _ttls = (
+        ('/get_ticker', 60),
+        ('coingecko.com', 300),
+        ('/get_volume', 3600),
+        ('/get_markets', 6 * 3600),
+        ('/assets', 3600),
+        ('cryptofresh.com', 3600),
+    )
+    _default_ttl = 0
+    # Prices feed order sizing, so their entries are revalidated before they are returned once TTL is over.
+    _no_stale = ('/get_ticker', 'coingecko.com')
+
+    def __init__(self, cache_dir):
+        self._cache_dir = cache_dir
+        self._stats = Counter()
+        self._lookups_count = 0
+
+    def _get_file(self, url):
+        return os.path.join(utils.dir_exists(self._cache_dir), hashlib.sha1(url.encode()).hexdigest())
+
+    def get_ttl(self, url):
+        return next((ttl for pattern, ttl in self._ttls if pattern in url), self._default_ttl)
+
+    def allows_stale(self, url):
+        return not any(pattern in url for pattern in self._no_stale)
+
+    def get_state(self, url, entry):
+        """
+        :return: 'fresh', 'stale' or 'expired'.
+        """
+        age = time.time() - entry['stored_at']
+        ttl = self.get_ttl(url)
+
+        if age < ttl:
+            return 'fresh'
+
+        if not self.allows_stale(url):
+            return 'expired'
+
+        return 'stale' if age < 2 * ttl else 'expired'
+
+    @staticmethod
+    def get_conditional_headers(entry):
+        headers = {}
+
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+
+        return headers
+
+    async def load(self, url):
+        """
+        :return: dict with body, etag, last_modified and stored_at of url or None.
+        """
+        try:
+            async with aiofiles.open(self._get_file(url), 'rb') as f:
+                entry = ujson.loads(zlib.decompress(await f.read()))
+        except (OSError, zlib.error, ValueError):
+            return None
+
+        return entry if entry.get('url') == url else None
+
+    async def _write(self, url, entry):
+        file = self._get_file(url)
+        tmp_file = f'{file}.tmp'
+
+        try:
+            async with aiofiles.open(tmp_file, 'wb') as f:
+                await f.write(zlib.compress(ujson.dumps(entry).encode()))
+
+            os.replace(tmp_file, file)
+
+        except OSError:
+            self._logger.exception(f'Could not cache response of {url}.')
+
+    async def store(self, url, headers, body):
+        await self._write(url, {
+            'url': url,
+            'body': body,
+            'etag': headers.get('ETag'),
+            'last_modified': headers.get('Last-Modified'),
+            'stored_at': time.time(),
+        })
+
+    async def touch(self, url, entry):
+        entry['stored_at'] = time.time()
+        await self._write(url, entry)
+
+    @property
+    def hit_rate(self):
+        """
+        Share of lookups answered from cache without waiting for the source.
+        """
+        hits = self._stats['fresh'] + self._stats['stale']
+
+        return hits / self._lookups_count if self._lookups_count else 0
+
+    def count(self, event):
+        """
+        :param event: 'fresh', 'stale', 'expired' or 'miss' for lookups, 'not_modified' for
+                      revalidations which got 304, 'served_on_error' for entries returned
+                      because the source is down.
+        """
+        self._stats[event] += 1
+
+        if event in ('fresh', 'stale', 'expired', 'miss'):
+            self._lookups_count += 1
+
+            if self._lookups_count % self._report_every == 0:
+                self.report()
+
+    def report(self):
+        if not self._lookups_count:
+            return
+
+        self._logger.info(f'{self._lookups_count} lookups, hit rate {self.hit_rate:.2f}: '
+                          f'fresh {self._stats["fresh"]}, stale {self._stats["stale"]}, '
+                          f'expired {self._stats["expired"]}, missed {self._stats["miss"]}, '
+                          f'not modified {self._stats["not_modified"]}, '
+                          f'served on error {self._stats["served_on_error"]}.')
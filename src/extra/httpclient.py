@@ -0,0 +1,214 @@
+# -*- coding: utf-8 -*-
+import logging
+import asyncio
+import aiohttp
+import ujson
+
+from urllib.parse import urlsplit
+from collections import namedtuple
+
+
+Response = namedtuple('Response', ['status', 'headers', 'body'])
+
+
+class HttpClient:
+    """
+    Shared aiohttp session with keep-alive for all http requests of the bot.
+
+    Requests to each host are limited by a semaphore and by a token bucket which holds one second
+    of requests, so callers may start all their requests at once and they are sent as fast as the
+    host budget allows. Requests which got 429, 5xx, timeout or connection error are retried with
+    exponential backoff, Retry-After header of the response is respected.
+
+    With HttpCache, responses are served from the cache and revalidated as it decides.
+    """
+    _logger = logging.getLogger('Rin.HttpClient')
+    _timeout = 30
+    _retries = 3
+    _backoff = 1
+    _max_backoff = 30
+    _burst_time = 1
+    _retry_statuses = frozenset((429, 500, 502, 503, 504))
+
+    def __init__(self, concurrency, requests_per_second, cache=None):
+        """
+        :param concurrency: max requests in flight to each host.
+        :param requests_per_second: max requests to each host per second, 0 - no limit.
+        :param cache: HttpCache instance, None - no cache.
+        """
+        self._concurrency = concurrency
+        self._requests_per_second = requests_per_second
+        self._cache = cache
+        self._session = None
+        self._semaphores = {}
+        self._next_slots = {}
+        self._fetching = {}
+
+    def _get_session(self):
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                timeout=aiohttp.ClientTimeout(total=self._timeout),
+                connector=aiohttp.TCPConnector(limit_per_host=self._concurrency)
+            )
+
+        return self._session
+
+    def _get_semaphore(self, host):
+        semaphore = self._semaphores.get(host)
+
+        if semaphore is None:
+            semaphore = self._semaphores[host] = asyncio.Semaphore(self._concurrency)
+
+        return semaphore
+
+    async def _acquire_token(self, host):
+        if not self._requests_per_second:
+            return
+
+        # Each request reserves the next free slot of the host, slots unused for the last
+        # _burst_time secs are given away at once.
+        now = asyncio.get_event_loop().time()
+        slot = max(self._next_slots.get(host, 0), now - self._burst_time)
+        self._next_slots[host] = slot + 1 / self._requests_per_second
+
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+    def _get_retry_delay(self, resp, attempt):
+        try:
+            return min(float(resp.headers['Retry-After']), self._max_backoff)
+        except (AttributeError, KeyError, ValueError):
+            return min(self._backoff * 2 ** attempt, self._max_backoff)
+
+    async def _request(self, url, headers, logger):
+        """
+        :return: Response with status 200 or 304 or None if it could not be got.
+        """
+        host = urlsplit(url).netloc
+
+        for attempt in range(self._retries + 1):
+            resp = None
+            await self._acquire_token(host)
+
+            async with self._get_semaphore(host):
+                try:
+                    async with self._get_session().get(url, headers=headers) as resp:
+                        if resp.status == 200:
+                            return Response(resp.status, resp.headers, await resp.text('utf-8'))
+
+                        if resp.status == 304:
+                            return Response(resp.status, resp.headers, None)
+
+                        if resp.status not in self._retry_statuses:
+                            logger.warning(f'Got status {resp.status} for {url}.')
+                            return
+
+                        logger.warning(f'Got status {resp.status} for {url}, attempt {attempt + 1}.')
+
+                except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                    logger.warning(f'Error while getting {url}, attempt {attempt + 1}.')
+
+            if attempt < self._retries:
+                await asyncio.sleep(self._get_retry_delay(resp, attempt))
+
+        logger.error(f'Could not get {url} in {self._retries + 1} attempts.')
+
+    async def _fetch(self, url, entry, logger):
+        """
+        :param entry: cached entry of url which is revalidated or None.
+        :return: body of response or None if it could not be got.
+        """
+        if self._cache is None:
+            response = await self._request(url, {}, logger)
+            return None if response is None else response.body
+
+        response = await self._request(url, self._cache.get_conditional_headers(entry) if entry else {}, logger)
+
+        if response is None:
+            return None
+
+        if response.status == 304 and entry is not None:
+            self._cache.count('not_modified')
+            await self._cache.touch(url, entry)
+            return entry['body']
+
+        if response.status == 304:
+            return None
+
+        await self._cache.store(url, response.headers, response.body)
+        return response.body
+
+    async def _fetch_once(self, url, entry, logger):
+        """
+        Concurrent fetches of the same url share a single request.
+        """
+        future = self._fetching.get(url)
+
+        if future is None:
+            future = self._fetching[url] = asyncio.ensure_future(self._fetch(url, entry, logger))
+            future.add_done_callback(lambda _: self._fetching.pop(url, None))
+
+        return await asyncio.shield(future)
+
+    async def _get_text(self, url, logger):
+        if self._cache is None:
+            return await self._fetch_once(url, None, logger)
+
+        entry = await self._cache.load(url)
+
+        if entry is None:
+            self._cache.count('miss')
+            return await self._fetch_once(url, None, logger)
+
+        state = self._cache.get_state(url, entry)
+        self._cache.count(state)
+
+        if state == 'fresh':
+            return entry['body']
+
+        if state == 'stale':
+            if url not in self._fetching:
+                asyncio.ensure_future(self._fetch_once(url, entry, logger))
+
+            return entry['body']
+
+        body = await self._fetch_once(url, entry, logger)
+
+        if body is None and self._cache.allows_stale(url):
+            self._cache.count('served_on_error')
+            logger.warning(f'Source of {url} is down, cached response is used.')
+
+            return entry['body']
+
+        return body
+
+    async def get(self, url, json=False, logger=None):
+        """
+        :param json: decode response as json.
+        :param logger: logger of the caller.
+        :return: decoded json or text of response or None if it could not be got.
+        """
+        logger = logger or self._logger
+        body = await self._get_text(url, logger)
+
+        if body is None or not json:
+            return body
+
+        try:
+            return ujson.loads(body)
+        except ValueError:
+            logger.warning(f'Could not decode json from {url}.')
+
+    async def close(self):
+        for future in list(self._fetching.values()):
+            future.cancel()
+
+        if self._cache is not None:
+            self._cache.report()
+
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+
+        self._session = None
+        self._semaphores.clear()
+        self._next_slots.clear()
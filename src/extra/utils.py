@@ -41,6 +41,31 @@ def get_dir_file(dir_, regex):
             pass
 
 
+def get_dir_files_by_age(dir_, regex):
+    """
+    :return: list of files which names start with regex, the newest first.
+    """
+    pattern = re.compile(fr'^{regex}-')
+    files = [file for file in os.listdir(dir_) if re.search(pattern, file)]
+
+    return sorted(files, key=lambda file: os.path.getmtime(os.path.join(dir_, file)), reverse=True)
+
+
+def get_newest_dir_file(dir_, regex):
+    files = get_dir_files_by_age(dir_, regex)
+
+    return files[0] if files else None
+
+
+def get_artifact_files(dir_, name):
+    """
+    New file name is got on each call, so each rebuild of artifact within a process writes its own file.
+
+    :return: tuple of path to the newest file of artifact or None and path to new file for it.
+    """
+    return get_file(dir_, get_newest_dir_file(dir_, name)), get_file(dir_, f'{name}-{get_today_date()}.lst')
+
+
 def read_file(file):
     with open(file, 'r') as f:
         return [line for line in f]
@@ -61,7 +86,7 @@ def clear_each_str_in_seq(seq, *args):
 
 
 def remove_file(file):
-    if file:
+    if file and os.path.isfile(file):
         os.remove(file)
 
 
@@ -1,11 +1,11 @@
 # -*- coding: utf-8 -*-
 import logging
-import asyncio
 
 from bs4 import BeautifulSoup
 
 from src.extra.baserin import BaseRin
 from src.extra import utils
+from src.extra.artifactwriter import ArtifactWriter
 
 
 class BTSPriceParser(BaseRin):
@@ -13,16 +13,13 @@ class BTSPriceParser(BaseRin):
     _site_url = 'https://www.coingecko.com/ru/%D0%B4%D0%B8%D0%BD%D0%B0%D0%BC%D0%B8%D0%BA%D0%B0_%D1%86%D0%B5%D0%BD' \
                 '/bitshares/usd'
     _node_url = 'http://185.208.208.184:5000/get_ticker?base=USD&quote=BTS'
-    _lock = asyncio.Lock()
-    _date = utils.get_today_date()
-    _old_file = utils.get_file(BaseRin.output_dir, utils.get_dir_file(BaseRin.output_dir, 'bst_price'))
-    _new_file = utils.get_file(BaseRin.output_dir, f'bst_price-{_date}.lst')
 
     def __init__(self, loop):
         self.ioloop = loop
+        self._old_file, self._new_file = utils.get_artifact_files(self.output_dir, 'bst_price')
 
     async def _get_price_from_node(self):
-        response = await self.get_data(self._node_url, delay=2, logger=self._logger, json=True)
+        response = await self.get_data(self._node_url, logger=self._logger, json=True)
 
         try:
             return float(response['latest'])
@@ -30,7 +27,7 @@ class BTSPriceParser(BaseRin):
             self._logger.warning(response['detail'])
 
     async def _parse_price_from_site(self):
-        html = await self.get_data(self._site_url, delay=2, logger=self._logger)
+        html = await self.get_data(self._site_url, logger=self._logger)
 
         bs_obj = BeautifulSoup(html, 'lxml')
         price = bs_obj.find('span', {'data-coin-symbol': 'bts'}).get_text() \
@@ -45,17 +42,17 @@ class BTSPriceParser(BaseRin):
             price = await method()
 
             if price:
-                await self.write_data(str(price), self._new_file, self._lock)
+                async with ArtifactWriter(self._new_file) as writer:
+                    await writer.write(str(price))
+
                 return price
 
         self._logger.warning('Could not get BTS price in USD.')
         return self.actions_when_error(self._old_file, value_from_file=True)
 
-    def get_bts_price_in_usd(self):
-        task = self.ioloop.create_task(self._get_price())
-
+    async def load_bts_price_in_usd(self):
         try:
-            price = self.ioloop.run_until_complete(asyncio.gather(task))
+            price = await self._get_price()
 
         except ValueError:
             self._logger.exception('Could not convert parsed price to float.')
@@ -75,6 +72,9 @@ class BTSPriceParser(BaseRin):
 
         else:
             utils.remove_file(self._old_file)
-            self._logger.info(f'BTS price is ${price[0]}.')
+            self._logger.info(f'BTS price is ${price}.')
 
-            return price[0]
+            return price
+
+    def get_bts_price_in_usd(self):
+        return self.ioloop.run_until_complete(self.load_bts_price_in_usd())
@@ -3,93 +3,109 @@ import re
 import logging
 import asyncio
 
+from io import BytesIO
 from collections import namedtuple
 
-from bs4 import BeautifulSoup
+from lxml import etree
 
 from src.extra.baserin import BaseRin
 from src.extra import utils
+from src.extra.artifactwriter import ArtifactWriter
 
 
 class CryptofreshParser(BaseRin):
     _logger = logging.getLogger('Rin.CryptofreshParser')
     _main_page_url = 'https://cryptofresh.com/assets'
     _assets_url = 'https://cryptofresh.com{}'
-    _lock = asyncio.Lock()
-    _date = utils.get_today_date()
-    _old_file = utils.get_file(BaseRin.output_dir, utils.get_dir_file(BaseRin.output_dir, 'pairs'))
-    _new_file = utils.get_file(BaseRin.output_dir, f'pairs-{_date}.lst')
     _pairs_count = 0
+    _volume_pattern = re.compile(r'\$\d+(?:[,.]?\d+)*')
+    _volume_trans = str.maketrans('', '', '$,')
+    _asset_pattern = re.compile(r'/a/\w+\.?\w+')
+    _market_pattern = re.compile(r'\w+\.?\w+ : \w+\.?\w+')
+    _cell_text = etree.XPath('string()')
+    _hrefs = etree.XPath('.//a/@href')
 
     def __init__(self, loop):
         self._ioloop = loop
+        self._old_file, self._new_file = utils.get_artifact_files(self.output_dir, 'pairs')
+        self._writer = ArtifactWriter(self._new_file)
+
+    @classmethod
+    def extract_valid_data(cls, html, min_volume, find_asset=False):
+        """
+        Rows of the first table body are streamed and parsing stops at the first row which volume
+        is not above min_volume, as rows are sorted by volume. It has no awaits, so it is run in
+        a worker thread.
+
+        :param find_asset: extract links of assets like /a/BTS instead of markets like BTS:CNY.
+        :return: list of extracted assets or markets.
+        """
+        valid_data = []
+        tbody = None
+        rows = etree.iterparse(BytesIO(html.encode('utf-8')), events=('end',), tag='tr', html=True)
+
+        for _, row in rows:
+            parent = row.getparent()
+
+            if tbody is None:
+                if parent is None or parent.tag != 'tbody':
+                    continue
 
-    @staticmethod
-    async def _get_volume(str_):
-        pattern = re.compile(r'(\$\d+([,.]?\d+)*)')
-        res = re.findall(pattern, str_)[2]
-        new_res = float(re.sub(r'\$?,?', '', res[0]).strip())
-
-        return new_res
+                tbody = parent
 
-    @staticmethod
-    async def _get_asset(str_, find_asset=False):
-        pattern = re.compile(r'/a/\w+\.?\w+') if find_asset \
-            else re.compile(r'\w+\.?\w+ : \w+\.?\w+')
+            elif parent is not tbody:
+                break
 
-        return re.findall(pattern, str_)[0].replace(' ', '').strip()
+            # Cells are joined by tabs, so text of neighbouring cells is never matched as one word.
+            text = '\t'.join(cls._cell_text(cell) for cell in row)
+            volumes = cls._volume_pattern.findall(text)
 
-    async def _get_valid_data(self, html, min_volume, find_asset=False):
-        bs_obj = BeautifulSoup(html, 'lxml')
-        table = bs_obj.find('tbody')
-        valid_assets = []
+            if len(volumes) < 3 or float(volumes[2].translate(cls._volume_trans)) <= min_volume:
+                break
 
-        for i, elem in enumerate(table.find_all('tr')):
-            data = await self._get_asset(str(elem), find_asset)
+            match = cls._asset_pattern.search(' '.join(cls._hrefs(row))) if find_asset \
+                else cls._market_pattern.search(text)
 
-            try:
-                vol = await self._get_volume(str(elem))
-            except IndexError:
-                break
+            if match:
+                valid_data.append(match.group().replace(' ', ''))
 
-            if vol > min_volume:
-                if not find_asset:
-                    await self.write_data(data, self._new_file, self._lock)
-                    self._pairs_count += 1
-                    continue
+            row.clear()
 
-                valid_assets.append(data)
+        return valid_data
 
-            else:
-                break
+    async def _get_valid_data(self, html, min_volume, find_asset=False):
+        valid_data = await self._ioloop.run_in_executor(
+            None, self.extract_valid_data, html, min_volume, find_asset
+        )
 
         if find_asset:
-            self._logger.info(f'Parsed: {len(valid_assets)} assets.')
+            self._logger.info(f'Parsed: {len(valid_data)} assets.')
 
-        return valid_assets
+        elif valid_data:
+            await self._writer.write('\n'.join(valid_data))
+            self._pairs_count += len(valid_data)
 
-    def start_parsing(self):
-        try:
-            task = self._ioloop.create_task(
-                self.get_data(self._main_page_url, delay=2, logger=self._logger)
-            )
-            assets_page_html = self._ioloop.run_until_complete(asyncio.gather(task))
+        return valid_data
 
-            task = self._ioloop.create_task(
-                self._get_valid_data(*assets_page_html, self.overall_min_daily_volume, True)
-            )
-            assets = self._ioloop.run_until_complete(asyncio.gather(task))[0]
+    async def _parse_asset_pairs(self, asset):
+        html = await self.get_data(self._assets_url.format(asset), logger=self._logger)
+        await self._get_valid_data(html, self.pair_min_daily_volume)
+
+    async def parse(self):
+        try:
+            assets_page_html = await self.get_data(self._main_page_url, logger=self._logger)
+            assets = await self._get_valid_data(assets_page_html, self.overall_min_daily_volume, True)
 
             if assets:
-                tasks = (self._ioloop.create_task(self.get_data(self._assets_url.format(asset),
-                                                                delay=30, logger=self._logger))
-                         for asset in assets)
-                htmls = self._ioloop.run_until_complete(asyncio.gather(*tasks))
+                results = await asyncio.gather(
+                    *(self._parse_asset_pairs(asset) for asset in assets), return_exceptions=True
+                )
+                errors_num = sum(isinstance(result, Exception) for result in results)
 
-                tasks = (self._ioloop.create_task(self._get_valid_data(html_, self.pair_min_daily_volume))
-                         for html_ in htmls)
-                self._ioloop.run_until_complete(asyncio.wait(tasks))
+                if errors_num:
+                    self._logger.warning(f'Could not parse pairs of {errors_num} of {len(assets)} assets.')
 
+                await self._writer.commit()
                 utils.remove_file(self._old_file)
                 self._logger.info(f'Parsed: {self._pairs_count} pairs.')
                 FileData = namedtuple('FileData', ['file', 'new_version'])
@@ -103,8 +119,13 @@ class CryptofreshParser(BaseRin):
 
         except TypeError:
             self._logger.exception('HTML data retrieval error.')
+            await self._writer.discard()
             return self.actions_when_error(self._old_file)
 
         except Exception as err:
             self._logger.exception('Exception occurred.', err)
+            await self._writer.discard()
             return self.actions_when_error(self._old_file)
+
+    def start_parsing(self):
+        return self._ioloop.run_until_complete(self.parse())
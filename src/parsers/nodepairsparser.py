@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+import logging
+import asyncio
+
+from collections import namedtuple, defaultdict
+
+from src.extra.baserin import BaseRin
+from src.extra import utils
+from src.extra.artifactwriter import ArtifactWriter
+
+from src.aiopybitshares.market import Market
+
+
+class NodePairsParser(BaseRin):
+    """
+    Discovers pairs by asking the node instead of scraping explorers.
+
+    Assets of the top markets by 24h volume whose volume over these markets is above overall min daily
+    volume are taken. Candidates are the top markets and markets of these assets against core assets,
+    whose 24h volumes are got concurrently over the multiplexed connections, so the number of requests
+    grows linearly with the number of assets. Candidates with volume above pair min daily volume are
+    written to the pairs file. Volumes are converted to dollars by prices of assets in BTS and of BTS in USD.
+    """
+    _logger = logging.getLogger('Rin.NodePairsParser')
+    _top_markets_limit = 100
+    _batch_size = 100
+    _core_asset = 'BTS'
+    _core_assets = ('BTS', 'CNY', 'USD', 'BRIDGE.BTC')
+    _usd_asset = 'USD'
+
+    def __init__(self, loop):
+        self._ioloop = loop
+        self._old_file, self._new_file = utils.get_artifact_files(self.output_dir, 'pairs')
+        self._market = Market()
+
+    async def _call_in_batches(self, method, args_seq):
+        """
+        :return: list of tuples of args and result of calls which succeeded, failed calls are skipped.
+        """
+        results = []
+
+        for i in range(0, len(args_seq), self._batch_size):
+            results.extend(
+                await asyncio.gather(*(method(*args) for args in args_seq[i:i + self._batch_size]),
+                                     return_exceptions=True)
+            )
+
+        errors_num = sum(isinstance(result, Exception) for result in results)
+
+        if errors_num:
+            self._logger.warning(f'{errors_num} of {len(results)} calls of {method.__name__} failed, skipped them.')
+
+        return [(args, result) for args, result in zip(args_seq, results) if not isinstance(result, Exception)]
+
+    async def _get_prices_in_bts(self, assets):
+        assets = [asset for asset in assets if asset != self._core_asset]
+        tickers = await self._call_in_batches(
+            self._market.get_ticker, [(self._core_asset, asset) for asset in assets]
+        )
+        prices = {asset: float(ticker['latest']) for (_, asset), ticker in tickers}
+        prices[self._core_asset] = 1.
+
+        return prices
+
+    @staticmethod
+    def _get_usd_volume(market, prices, bts_price):
+        """
+        :param market: ticker or 24h volume of market.
+        :return: 24h volume of market in dollars by the side which has price in BTS, 0 if none has.
+        """
+        base_price = prices.get(market['base'], 0)
+
+        if base_price > 0:
+            return float(market['base_volume']) * base_price * bts_price
+
+        return float(market['quote_volume']) * prices.get(market['quote'], 0) * bts_price
+
+    async def _get_top_markets_volumes(self):
+        """
+        :return: tuple of dict of top markets and their volumes in dollars, prices of their assets in BTS
+                 and price of BTS in dollars.
+        """
+        top_markets, bts_ticker = await asyncio.gather(
+            self._market.get_top_markets(self._top_markets_limit),
+            self._market.get_ticker(self._usd_asset, self._core_asset)
+        )
+        bts_price = float(bts_ticker['latest'])
+
+        if not bts_price > 0:
+            raise ValueError('Got no price of BTS in USD.')
+
+        prices = await self._get_prices_in_bts({market[key] for market in top_markets for key in ('base', 'quote')})
+        volumes = {
+            (market['base'], market['quote']): self._get_usd_volume(market, prices, bts_price)
+            for market in top_markets
+        }
+
+        return volumes, prices, bts_price
+
+    def _get_valid_assets(self, volumes):
+        assets_volumes = defaultdict(float)
+
+        for (base, quote), volume in volumes.items():
+            assets_volumes[base] += volume
+            assets_volumes[quote] += volume
+
+        assets = sorted(asset for asset, volume in assets_volumes.items() if volume > self.overall_min_daily_volume)
+        self._logger.info(f'Parsed: {len(assets)} assets.')
+
+        return assets
+
+    def _get_candidate_markets(self, assets, known_markets):
+        """
+        :return: list of markets of assets against core assets which are not known yet.
+        """
+        markets = set(known_markets)
+        candidates = []
+
+        for core_asset in self._core_assets:
+            if core_asset not in assets:
+                continue
+
+            for asset in assets:
+                if asset != core_asset and (core_asset, asset) not in markets and (asset, core_asset) not in markets:
+                    markets.add((core_asset, asset))
+                    candidates.append((core_asset, asset))
+
+        return candidates
+
+    async def _get_markets_volumes(self, assets, known_volumes, prices, bts_price):
+        """
+        :return: dict of candidate markets which volumes are not known yet and their volumes in dollars.
+        """
+        markets = self._get_candidate_markets(assets, known_volumes)
+        markets_volumes = await self._call_in_batches(self._market.get_24_volume, markets)
+
+        return {
+            (base, quote): self._get_usd_volume(
+                {'base': base, 'quote': quote, **market_volumes}, prices, bts_price
+            )
+            for (base, quote), market_volumes in markets_volumes
+        }
+
+    async def _get_valid_pairs(self):
+        volumes, prices, bts_price = await self._get_top_markets_volumes()
+        assets = self._get_valid_assets(volumes)
+        volumes.update(await self._get_markets_volumes(assets, volumes, prices, bts_price))
+
+        return [
+            f'{base}:{quote}' for (base, quote), volume in volumes.items() if volume > self.pair_min_daily_volume
+        ]
+
+    async def parse(self):
+        try:
+            pairs = await self._get_valid_pairs()
+
+            if not pairs:
+                raise ValueError('Got no pairs with volume above min daily volume.')
+
+            async with ArtifactWriter(self._new_file) as writer:
+                await writer.write('\n'.join(pairs))
+
+        except Exception:
+            self._logger.exception('Exception occurred while discovering pairs on node.')
+            return self.actions_when_error(self._old_file)
+
+        utils.remove_file(self._old_file)
+        self._logger.info(f'Parsed: {len(pairs)} pairs.')
+        FileData = namedtuple('FileData', ['file', 'new_version'])
+
+        return FileData(self._new_file, True)
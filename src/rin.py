@@ -14,11 +14,16 @@ class Rin:
     @staticmethod
     def start_arbitrage():
         from src.core.bitsharesarbitrage import BitsharesArbitrage
+        from src.aiopybitshares.connectionpool import pool
+        from src.aiopybitshares.noderouter import router
         ioloop = asyncio.get_event_loop()
 
         try:
             BitsharesArbitrage(ioloop).start_arbitrage()
         finally:
+            ioloop.run_until_complete(router.close())
+            ioloop.run_until_complete(pool.close())
+            ioloop.run_until_complete(BaseRin.http_client.close())
             ioloop.close()
 
 